@@ -175,31 +175,12 @@ async def create_stripe_portal_session(
     return StripePortalResponse(url=url)
 
 
-@router.post("/stripe/webhook")
-async def stripe_webhook(
-    request: Request,
-    stripe_signature: str | None = Header(default=None, alias="stripe-signature"),
-    db: Session = Depends(get_db),
-) -> dict:
-    if stripe is None:
-        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Stripe bağımlılığı yok")
-
-    webhook_secret = settings.STRIPE_WEBHOOK_SECRET.strip()
-    if not webhook_secret:
-        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Stripe webhook secret eksik")
-    if not stripe_signature:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="stripe-signature header eksik")
-
-    payload_bytes = await request.body()
-    try:
-        event = stripe.Webhook.construct_event(
-            payload=payload_bytes,
-            sig_header=stripe_signature,
-            secret=webhook_secret,
-        )
-    except Exception:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Webhook imzası doğrulanamadı")
+def process_stripe_event(db: Session, event: Any) -> dict:
+    """
+    Apply a verified Stripe event exactly once.
 
+    Events already marked as processed are acknowledged as duplicates.
+    """
     event_id = str(_read_value(event, "id", "")).strip()
     event_type = str(_read_value(event, "type", "")).strip()
     if not event_id:
@@ -268,3 +249,31 @@ async def stripe_webhook(
     db.commit()
 
     return {"received": True}
+
+
+@router.post("/stripe/webhook")
+async def stripe_webhook(
+    request: Request,
+    stripe_signature: str | None = Header(default=None, alias="stripe-signature"),
+    db: Session = Depends(get_db),
+) -> dict:
+    if stripe is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Stripe bağımlılığı yok")
+
+    webhook_secret = settings.STRIPE_WEBHOOK_SECRET.strip()
+    if not webhook_secret:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Stripe webhook secret eksik")
+    if not stripe_signature:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="stripe-signature header eksik")
+
+    payload_bytes = await request.body()
+    try:
+        event = stripe.Webhook.construct_event(
+            payload=payload_bytes,
+            sig_header=stripe_signature,
+            secret=webhook_secret,
+        )
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Webhook imzası doğrulanamadı")
+
+    return process_stripe_event(db, event)
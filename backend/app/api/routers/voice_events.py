@@ -12,9 +12,10 @@ from typing import Any
 from uuid import UUID
 
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
 from sqlalchemy.orm import Session
 
+from app.core.voice_protocol import VOICE_EVENT_BATCH_MAX_EVENTS
 from app.core.voice_security import verify_voice_gateway_request_dependency
 from app.db.session import get_db
 from app.models.call import Call, CallDirection, CallStatus
@@ -43,19 +44,35 @@ class VoiceEvent(BaseModel):
     call: dict[str, Any] | None = None
     metadata: dict[str, Any] | None = None
 
+    # The request body as the gateway sent it, forwarded to n8n untouched.
+    _raw_payload: dict[str, Any] | None = PrivateAttr(default=None)
+
     class Config:
         populate_by_name = True
 
+    @model_validator(mode="wrap")
+    @classmethod
+    def _keep_raw_payload(cls, data: Any, handler):
+        event = handler(data)
+        if isinstance(data, dict):
+            event._raw_payload = data
+        return event
+
 
 class VoiceIngestResponse(BaseModel):
     accepted: bool
     run_id: str | None = Field(default=None, alias="runId")
     message: str | None = None
+    error: str | None = None
 
     class Config:
         populate_by_name = True
 
 
+class VoiceEventBatch(BaseModel):
+    events: list[VoiceEvent] = Field(..., min_length=1, max_length=VOICE_EVENT_BATCH_MAX_EVENTS)
+
+
 @router.post("/events", response_model=VoiceIngestResponse)
 async def ingest_voice_event(
     request: Request,
@@ -63,6 +80,49 @@ async def ingest_voice_event(
     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     _: dict = Depends(verify_voice_gateway_request_dependency),
+) -> VoiceIngestResponse:
+    return await _ingest_event(request, body, background_tasks, db)
+
+
+@router.post("/events:batch", response_model=list[VoiceIngestResponse])
+async def ingest_voice_event_batch(
+    request: Request,
+    body: VoiceEventBatch,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    _: dict = Depends(verify_voice_gateway_request_dependency),
+) -> list[VoiceIngestResponse]:
+    """
+    Ingest several gateway events from one signed request.
+
+    The gateway coalesces events that are ready at the same time (e.g. the
+    started/completed pair of a short call). Events are applied in order and
+    each failure is reported in its own response entry, with ``error`` set,
+    without stopping the rest of the batch.
+
+    An event is not atomic: the Call row is committed before the audit log
+    and usage counter write, and those commit separately. If a later step
+    fails, the call state it already stored is kept and only the remaining
+    steps are skipped.
+    """
+    results: list[VoiceIngestResponse] = []
+    for event in body.events:
+        try:
+            results.append(await _ingest_event(request, event, background_tasks, db))
+        except HTTPException as exc:
+            results.append(VoiceIngestResponse(accepted=False, runId=event.event_id, error=str(exc.detail)))
+        except Exception as exc:
+            db.rollback()
+            logger.error("Voice batch event %s failed: %s", event.event_id, exc, exc_info=True)
+            results.append(VoiceIngestResponse(accepted=False, runId=event.event_id, error="Event processing failed"))
+    return results
+
+
+async def _ingest_event(
+    request: Request,
+    body: VoiceEvent,
+    background_tasks: BackgroundTasks,
+    db: Session,
 ) -> VoiceIngestResponse:
     tenant = db.query(Tenant).filter(Tenant.id == body.tenant_id).first()
     if tenant is None:
@@ -144,12 +204,6 @@ async def ingest_voice_event(
     if not workflow_id:
         return VoiceIngestResponse(accepted=False, message="No n8n workflow configured for call channel")
 
-    raw_payload: dict[str, Any] | None = None
-    try:
-        raw_payload = await request.json()
-    except Exception:
-        raw_payload = None
-
     timestamp = body.timestamp
     if not timestamp:
         timestamp = datetime.now(timezone.utc).isoformat()
@@ -168,7 +222,7 @@ async def ingest_voice_event(
                 timestamp=timestamp,
                 correlation_id=body.correlation_id,
                 contact_name=None,
-                raw_payload=raw_payload,
+                raw_payload=body._raw_payload,
                 metadata={"call": body.call or {}, **(body.metadata or {})},
             )
             logger.info("Voice event accepted: tenant=%s run=%s type=%s", body.tenant_id, run.id, body.event_type)
@@ -20,6 +20,7 @@ INSECURE_DEFAULT_SECRETS = [
     "change-this-to-a-secure-random-string-voice-gateway-to-svontai",
     "your-super-secret-jwt-key-change-in-production",
 ]
+INSECURE_DEFAULT_SECRETS_SET = frozenset(INSECURE_DEFAULT_SECRETS)
 
 
 class Settings(BaseSettings):
@@ -70,6 +71,7 @@ class Settings(BaseSettings):
     
     # Encryption
     ENCRYPTION_KEY: str = ""  # 32-byte base64 encoded key, generated if not set
+    ENCRYPTION_WRITE_AES_GCM: bool = False  # Write new values as AES-GCM ("v2:"); one-way once enabled
     
     # Application URLs
     BACKEND_URL: str = "http://localhost:8000"
@@ -269,7 +271,7 @@ class Settings(BaseSettings):
             return self
         
         # Check JWT secret
-        if self.JWT_SECRET_KEY in INSECURE_DEFAULT_SECRETS:
+        if self.JWT_SECRET_KEY in INSECURE_DEFAULT_SECRETS_SET:
             raise ValueError(
                 "FATAL: JWT_SECRET_KEY is set to an insecure default value. "
                 "You MUST set a secure, randomly generated secret in production. "
@@ -278,21 +280,21 @@ class Settings(BaseSettings):
         
         # Only validate n8n secrets if n8n is enabled
         if self.USE_N8N:
-            if self.SVONTAI_TO_N8N_SECRET in INSECURE_DEFAULT_SECRETS:
+            if self.SVONTAI_TO_N8N_SECRET in INSECURE_DEFAULT_SECRETS_SET:
                 raise ValueError(
                     "FATAL: SVONTAI_TO_N8N_SECRET is set to an insecure default value. "
                     "You MUST set a secure, randomly generated secret in production. "
                     "Generate one with: python -c \"import secrets; print(secrets.token_urlsafe(32))\""
                 )
             
-            if self.N8N_TO_SVONTAI_SECRET in INSECURE_DEFAULT_SECRETS:
+            if self.N8N_TO_SVONTAI_SECRET in INSECURE_DEFAULT_SECRETS_SET:
                 raise ValueError(
                     "FATAL: N8N_TO_SVONTAI_SECRET is set to an insecure default value. "
                     "You MUST set a secure, randomly generated secret in production. "
                     "Generate one with: python -c \"import secrets; print(secrets.token_urlsafe(32))\""
                 )
 
-        if self.VOICE_GATEWAY_TO_SVONTAI_SECRET in INSECURE_DEFAULT_SECRETS:
+        if self.VOICE_GATEWAY_TO_SVONTAI_SECRET in INSECURE_DEFAULT_SECRETS_SET:
             raise ValueError(
                 "FATAL: VOICE_GATEWAY_TO_SVONTAI_SECRET is set to an insecure default value. "
                 "You MUST set a secure, randomly generated secret in production."
@@ -1,14 +1,21 @@
 """
 Encryption utilities for secure storage of sensitive data.
-Uses Fernet symmetric encryption (AES-128-CBC with HMAC).
+Writes Fernet (AES-128-CBC with HMAC) tokens unless ENCRYPTION_WRITE_AES_GCM
+is enabled, in which case new data is sealed with AES-256-GCM. Both formats
+always decrypt, so the flag can be turned on without re-encrypting anything;
+turning it back off needs a release that still reads "v2:" values.
 """
 
 import base64
+import binascii
 import os
 from typing import Optional
 
+from cryptography.exceptions import InvalidTag
 from cryptography.fernet import Fernet, InvalidToken
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
 from app.core.config import settings
@@ -17,12 +24,18 @@ from app.core.config import settings
 class EncryptionService:
     """Service for encrypting and decrypting sensitive data."""
     
-    def __init__(self, key: Optional[str] = None):
+    # Marks AES-GCM ciphertexts; Fernet tokens never contain ":".
+    GCM_PREFIX = "v2:"
+    GCM_NONCE_SIZE = 12
+    
+    def __init__(self, key: Optional[str] = None, write_gcm: Optional[bool] = None):
         """
         Initialize the encryption service.
         
         Args:
-            key: Base64-encoded 32-byte key. If not provided, uses ENCRYPTION_KEY from settings.
+            key: Base64-encoded 32-byte Fernet key. If not provided, uses ENCRYPTION_KEY from settings.
+                The AES-256-GCM key is derived from it with HKDF.
+            write_gcm: Encrypt new values with AES-256-GCM. Defaults to ENCRYPTION_WRITE_AES_GCM.
         """
         encryption_key = key or getattr(settings, 'ENCRYPTION_KEY', None)
         
@@ -31,16 +44,41 @@ class EncryptionService:
             encryption_key = self._derive_key_from_secret(settings.JWT_SECRET_KEY)
         
         # Ensure key is valid Fernet key (32 bytes, base64 encoded)
+        fernet_key = encryption_key.encode() if isinstance(encryption_key, str) else encryption_key
         try:
-            self.fernet = Fernet(encryption_key.encode() if isinstance(encryption_key, str) else encryption_key)
+            self.fernet = Fernet(fernet_key)
         except (ValueError, TypeError):
             # If key is not a valid Fernet key, derive one
-            derived_key = self._derive_key_from_secret(encryption_key)
-            self.fernet = Fernet(derived_key)
+            fernet_key = self._derive_key_from_secret(encryption_key)
+            self.fernet = Fernet(fernet_key)
+        
+        if write_gcm is None:
+            write_gcm = getattr(settings, 'ENCRYPTION_WRITE_AES_GCM', False)
+        self.write_gcm = write_gcm
+        
+        # One AEAD instance per key, reused for every call. Its key is derived
+        # from the Fernet key material so ENCRYPTION_KEY keeps its format.
+        self._aead = AESGCM(self._derive_gcm_key(fernet_key))
+    
+    @staticmethod
+    def _derive_gcm_key(fernet_key: bytes) -> bytes:
+        """
+        Derive the AES-256-GCM key from a base64-encoded Fernet key with
+        HKDF-SHA256, so both ciphers share one configured secret.
+        """
+        hkdf = HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=None,
+            info=b"svontai-aes-gcm-v1",
+        )
+        return hkdf.derive(base64.urlsafe_b64decode(fernet_key))
     
     def _derive_key_from_secret(self, secret: str) -> bytes:
         """
-        Derive a Fernet-compatible key from an arbitrary secret.
+        Derive the base key from an arbitrary secret with PBKDF2.
+        
+        The result is a valid Fernet key and the input for the AES-GCM key.
         
         Args:
             secret: The secret string to derive key from.
@@ -70,20 +108,25 @@ class EncryptionService:
             plaintext: The string to encrypt.
             
         Returns:
-            Base64-encoded encrypted string.
+            A Fernet token, or a "v2:"-prefixed base64 AES-GCM blob when
+            write_gcm is enabled.
         """
         if not plaintext:
             return ""
         
-        encrypted = self.fernet.encrypt(plaintext.encode())
-        return encrypted.decode()
+        if not self.write_gcm:
+            return self.fernet.encrypt(plaintext.encode()).decode()
+        
+        nonce = os.urandom(self.GCM_NONCE_SIZE)
+        sealed = self._aead.encrypt(nonce, plaintext.encode(), None)
+        return self.GCM_PREFIX + base64.urlsafe_b64encode(nonce + sealed).decode()
     
     def decrypt(self, ciphertext: str) -> Optional[str]:
         """
-        Decrypt an encrypted string.
+        Decrypt an encrypted string in either format.
         
         Args:
-            ciphertext: The base64-encoded encrypted string.
+            ciphertext: A Fernet token or a "v2:"-prefixed AES-GCM blob.
             
         Returns:
             The decrypted plaintext string, or None if decryption fails.
@@ -91,6 +134,14 @@ class EncryptionService:
         if not ciphertext:
             return None
         
+        if ciphertext.startswith(self.GCM_PREFIX):
+            try:
+                blob = base64.urlsafe_b64decode(ciphertext[len(self.GCM_PREFIX):])
+                nonce, sealed = blob[:self.GCM_NONCE_SIZE], blob[self.GCM_NONCE_SIZE:]
+                return self._aead.decrypt(nonce, sealed, None).decode()
+            except (InvalidTag, ValueError, binascii.Error):
+                return None
+        
         try:
             decrypted = self.fernet.decrypt(ciphertext.encode())
             return decrypted.decode()
@@ -112,7 +163,7 @@ class EncryptionService:
         if plaintext is None:
             return None
         
-        new_service = EncryptionService(new_key)
+        new_service = EncryptionService(new_key, write_gcm=self.write_gcm)
         return new_service.encrypt(plaintext)
 
 
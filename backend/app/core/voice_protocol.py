@@ -0,0 +1,9 @@
+"""
+Limits of the Voice Gateway -> SvontAI wire protocol.
+
+The gateway imports this module too, so it must not import backend settings
+or anything else with side effects.
+"""
+
+# Most events accepted by POST /api/v1/voice/events:batch in one request.
+VOICE_EVENT_BATCH_MAX_EVENTS = 50
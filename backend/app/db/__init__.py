@@ -1,6 +1,14 @@
 # Database module
-from app.db.session import get_db, engine, SessionLocal
+from app.db import session as _session
+from app.db.session import get_db
 from app.db.base import Base
 
 __all__ = ["get_db", "engine", "SessionLocal", "Base"]
 
+
+def __getattr__(name: str):
+    # Resolve engine/SessionLocal from app.db.session on every access so the
+    # package never holds a stale copy when the session module is rebound.
+    if name in {"engine", "SessionLocal"}:
+        return getattr(_session, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
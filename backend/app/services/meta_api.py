@@ -3,15 +3,39 @@ Meta Graph API service for WhatsApp Business API integration.
 Handles OAuth, token exchange, and WABA management.
 """
 
+import hashlib
+import hmac
 import secrets
 import httpx
+from functools import lru_cache
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
-from urllib.parse import urlencode, urlparse, parse_qs
+from urllib.parse import quote_plus, urlparse, parse_qs
 
 from app.core.config import settings
 
 
+@lru_cache(maxsize=8)
+def _oauth_url_prefix(api_version: str, app_id: str, redirect_uri: str, scope: str, config_id: str) -> str:
+    """
+    Build the OAuth dialog URL up to (but excluding) the per-request state.
+
+    Keyed on every input, so a config change simply misses the cache.
+    """
+    params = (
+        ("client_id", app_id),
+        ("redirect_uri", redirect_uri),
+        ("scope", scope),
+        ("response_type", "code"),
+        # Enable Embedded Signup
+        ("config_id", config_id),
+    )
+    # Same encoding as urlencode() (quote_plus on every value), without the
+    # intermediate dict and sequence handling.
+    query = "&".join(f"{key}={quote_plus(value)}" for key, value in params if value)
+    return f"https://www.facebook.com/{api_version}/dialog/oauth?{query}"
+
+
 class MetaAPIError(Exception):
     """Custom exception for Meta API errors."""
     
@@ -48,6 +72,18 @@ class MetaAPIService:
         # Update base URLs with configured version
         self.graph_base = f"https://graph.facebook.com/{self.api_version}"
 
+    @property
+    def app_secret(self) -> str:
+        return self._app_secret
+
+    @app_secret.setter
+    def app_secret(self, value: str) -> None:
+        # Key the HMAC once per secret; verification copies the keyed state
+        # instead of re-encoding the secret and re-deriving the pads.
+        self._app_secret = value
+        self._app_secret_bytes = (value or "").encode("utf-8")
+        self._hmac_template = hmac.new(self._app_secret_bytes, b"", hashlib.sha256)
+
     @staticmethod
     def _is_placeholder(value: str) -> bool:
         normalized = (value or "").strip().upper()
@@ -277,18 +313,16 @@ class MetaAPIService:
         """
         self.validate_onboarding_config()
 
-        params = {
-            "client_id": self.app_id,
-            "redirect_uri": self.redirect_uri,
-            "state": state,
-            "scope": ",".join(self.WHATSAPP_PERMISSIONS),
-            "response_type": "code",
-            # Enable Embedded Signup
-            "config_id": getattr(settings, 'META_CONFIG_ID', ''),
-        }
-
-        query = urlencode({k: v for k, v in params.items() if v})
-        return f"https://www.facebook.com/{self.api_version}/dialog/oauth?{query}"
+        prefix = _oauth_url_prefix(
+            self.api_version,
+            self.app_id,
+            self.redirect_uri,
+            ",".join(self.WHATSAPP_PERMISSIONS),
+            getattr(settings, 'META_CONFIG_ID', ''),
+        )
+        if not state:
+            return prefix
+        return f"{prefix}&state={quote_plus(state)}"
     
     def get_embedded_signup_config(self, state: str) -> Dict[str, Any]:
         """
@@ -777,22 +811,23 @@ class MetaAPIService:
         Returns:
             True if signature is valid.
         """
-        import hmac
-        import hashlib
-        
         if not signature or not signature.startswith("sha256="):
             return False
         
         expected_signature = signature[7:]  # Remove "sha256=" prefix
         
-        computed = hmac.new(
-            self.app_secret.encode(),
-            payload,
-            hashlib.sha256
-        ).hexdigest()
+        mac = self._hmac_template.copy()
+        mac.update(payload)
+        computed = mac.hexdigest()
         
         return hmac.compare_digest(computed, expected_signature)
 
 
+@lru_cache(maxsize=1)
+def get_meta_service() -> MetaAPIService:
+    """Return the process-wide MetaAPIService, built on first use."""
+    return MetaAPIService()
+
+
 # Singleton instance
-meta_api_service = MetaAPIService()
+meta_api_service = get_meta_service()
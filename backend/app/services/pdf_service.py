@@ -9,6 +9,15 @@ from datetime import datetime
 
 
 class SimplePdfService:
+    PDF_HEADER = b"%PDF-1.4\n"
+
+    @classmethod
+    def header_bytes(cls) -> bytes:
+        """
+        Return the static header every generated PDF starts with.
+        """
+        return cls.PDF_HEADER
+
     @staticmethod
     def _ascii_safe(value: str) -> str:
         normalized = unicodedata.normalize("NFKD", value or "")
@@ -68,7 +77,7 @@ class SimplePdfService:
         objects.append(b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream")
         objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
 
-        pdf = b"%PDF-1.4\n"
+        pdf = SimplePdfService.PDF_HEADER
         offsets = [0]
         for index, obj in enumerate(objects, start=1):
             offsets.append(len(pdf))
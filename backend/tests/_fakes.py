@@ -0,0 +1,102 @@
+"""
+Reusable test doubles shared across test modules.
+"""
+
+from __future__ import annotations
+
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Callable
+
+import httpx
+
+
+def make_fake_async_client(status_code: int, headers: dict) -> type:
+    """
+    Build an httpx.AsyncClient stand-in whose `get` always returns the
+    given status code and headers.
+    """
+    response = SimpleNamespace(status_code=status_code, headers=headers)
+
+    class FakeAsyncClient:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, exc_type, exc, tb):
+            return False
+
+        async def get(self, *args, **kwargs):
+            return response
+
+    return FakeAsyncClient
+
+
+def make_mock_transport_client(handler: Callable[[httpx.Request], httpx.Response]) -> type:
+    """
+    Build an httpx.AsyncClient subclass that answers every request with
+    `handler` through httpx.MockTransport, so responses are real
+    httpx.Response objects and no network is touched.
+    """
+    transport = httpx.MockTransport(handler)
+
+    class MockTransportAsyncClient(httpx.AsyncClient):
+        def __init__(self, *args, **kwargs):
+            kwargs["transport"] = transport
+            super().__init__(*args, **kwargs)
+
+    return MockTransportAsyncClient
+
+
+class FakeQuery:
+    """
+    Chainable stand-in for a SQLAlchemy Query that returns fixed results.
+    """
+
+    __slots__ = ("_first", "_count")
+
+    def __init__(self, first=None, count: int = 0):
+        self._first = first
+        self._count = count
+
+    def filter(self, *args, **kwargs):
+        return self
+
+    def first(self):
+        return self._first
+
+    def count(self) -> int:
+        return self._count
+
+
+class FakeSession:
+    """
+    Session stand-in whose `query()` hands out the given queries in order
+    and records what was added and how often it committed. `refresh()`
+    fills the id/created_at defaults the database would have assigned.
+    """
+
+    __slots__ = ("_queries", "added", "commits")
+
+    def __init__(self, *queries: FakeQuery):
+        self._queries = list(queries)
+        self.added: list = []
+        self.commits = 0
+
+    def query(self, *entities):
+        return self._queries.pop(0)
+
+    def add(self, obj) -> None:
+        self.added.append(obj)
+
+    def commit(self) -> None:
+        self.commits += 1
+
+    def refresh(self, obj) -> None:
+        if getattr(obj, "id", None) is None:
+            obj.id = str(uuid.uuid4())
+        if getattr(obj, "created_at", None) is None:
+            obj.created_at = datetime.utcnow()
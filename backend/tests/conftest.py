@@ -1,10 +1,145 @@
 import pytest
 import os
+import uuid
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.pool import StaticPool
 
+# The webhook alias router refuses to import without credentials.
+os.environ.setdefault("WEBHOOK_USERNAME", "test-webhook")
+os.environ.setdefault("WEBHOOK_PASSWORD", "test-webhook-pass")
+
+from app.core.config import settings  # noqa: E402
+from app.db.base import Base  # noqa: E402
+import app.models  # noqa: E402,F401
+import app.db.session as session_module  # noqa: E402
+from app.db.session import get_db  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services.meta_api import get_meta_service  # noqa: E402
+from app.models.bot import Bot  # noqa: E402
+from app.models.conversation import Conversation, ConversationSource  # noqa: E402
+from app.models.tenant import Tenant  # noqa: E402
+from app.models.user import User  # noqa: E402
+
+@pytest.fixture(scope="session")
+def engine():
+    """In-memory engine with the schema created once for the whole run."""
+    engine = create_engine(
+        "sqlite+pysqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+        # The engine lives for the whole run, so size the compiled-statement
+        # cache to hold every query shape the suite issues.
+        query_cache_size=1200,
+    )
+
+    # pysqlite manages BEGIN/COMMIT itself, which breaks SAVEPOINT nesting;
+    # hand transaction control back to SQLAlchemy.
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, _connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _emit_begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, _connection_record):
+        # The database is private to this process, so journaling work on
+        # every commit buys nothing.
+        #
+        # foreign_keys stays off: tickets, system_events, incidents and
+        # automation rows keep tenant/user ids as dashed String(36), while
+        # SQLite stores the Uuid primary keys they point at as 32-char hex,
+        # so every such reference would fail the check here.
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.execute("PRAGMA journal_mode=MEMORY")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture()
+def db(engine):
+    """
+    Session wrapped in an outer transaction that is rolled back after the test.
+
+    Service-level commits only release a SAVEPOINT, so no test sees rows
+    written by another.
+    """
+    connection = engine.connect()
+    transaction = connection.begin()
+    session = Session(
+        bind=connection,
+        autoflush=False,
+        # Nothing writes behind the session's back, so skip the reload
+        # SELECTs that expiring on every commit would trigger.
+        expire_on_commit=False,
+        join_transaction_mode="create_savepoint",
+    )
+    try:
+        yield session
+    finally:
+        session.close()
+        transaction.rollback()
+        connection.close()
+
+
+@pytest.fixture(scope="session")
+def meta_service():
+    """
+    The shared MetaAPIService. Tests must change its attributes through
+    monkeypatch so the next test sees the configured values again.
+    """
+    return get_meta_service()
+
+
+@pytest.fixture()
+def owner(db):
+    """Unflushed owner; the tenant fixture writes both in one flush."""
+    user = User(
+        email=f"owner-{uuid.uuid4().hex[:10]}@example.com",
+        password_hash="hash",
+        full_name="Owner",
+        is_admin=False,
+        is_active=True,
+    )
+    db.add(user)
+    return user
+
+
+@pytest.fixture()
+def tenant(db, owner):
+    tenant = Tenant(name="Acme Homes", owner=owner, settings={})
+    db.add(tenant)
+    db.flush()
+    return tenant
+
+
+@pytest.fixture()
+def bot(db, tenant):
+    # Linked through the relationship and written by the next flush/commit.
+    bot = Bot(tenant=tenant, name="Homes Bot", welcome_message="Merhaba!")
+    db.add(bot)
+    return bot
+
+
+@pytest.fixture()
+def conversation(db, bot):
+    conversation = Conversation(
+        bot=bot,
+        external_user_id="+905551112233",
+        source=ConversationSource.WHATSAPP.value,
+        extra_data={},
+    )
+    db.add(conversation)
+    return conversation
+
 
 @pytest.fixture()
 def client(monkeypatch):
@@ -14,41 +149,36 @@ def client(monkeypatch):
     This fixture is intentionally opt-in (only used by tests that request it),
     so existing unit tests remain unaffected.
     """
-    from app.core.config import settings
-
-    old_environment = settings.ENVIRONMENT
-    old_email_enabled = settings.EMAIL_ENABLED
-    old_webhook_username = os.environ.get("WEBHOOK_USERNAME")
-    old_webhook_password = os.environ.get("WEBHOOK_PASSWORD")
-
-    settings.ENVIRONMENT = "dev"
-    settings.EMAIL_ENABLED = False
-    os.environ["WEBHOOK_USERNAME"] = old_webhook_username or "test-webhook"
-    os.environ["WEBHOOK_PASSWORD"] = old_webhook_password or "test-webhook-pass"
+    monkeypatch.setattr(settings, "ENVIRONMENT", "dev")
+    monkeypatch.setattr(settings, "EMAIL_ENABLED", False)
+    monkeypatch.setenv("WEBHOOK_USERNAME", os.environ.get("WEBHOOK_USERNAME") or "test-webhook")
+    monkeypatch.setenv("WEBHOOK_PASSWORD", os.environ.get("WEBHOOK_PASSWORD") or "test-webhook-pass")
 
     engine = create_engine(
         "sqlite+pysqlite://",
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,
     )
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-    import app.db.session as session_module
-    monkeypatch.setattr(session_module, "engine", engine, raising=False)
-    monkeypatch.setattr(session_module, "SessionLocal", TestingSessionLocal, raising=False)
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, _connection_record):
+        # StaticPool keeps a single connection, so this runs once per test.
+        # Same settings, and the same reason for leaving foreign_keys off, as
+        # the shared engine fixture.
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.execute("PRAGMA journal_mode=MEMORY")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
 
-    import app.db as db_module
-    monkeypatch.setattr(db_module, "engine", engine, raising=False)
-    monkeypatch.setattr(db_module, "SessionLocal", TestingSessionLocal, raising=False)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-    from app.db.base import Base
-    import app.models  # noqa: F401
+    # app.db re-exports these lazily, so patching the session module is enough.
+    monkeypatch.setattr(session_module, "engine", engine)
+    monkeypatch.setattr(session_module, "SessionLocal", TestingSessionLocal)
 
     Base.metadata.create_all(bind=engine)
 
-    from app.main import app
-    from app.db.session import get_db
-
     def override_get_db():
         db = TestingSessionLocal()
         try:
@@ -63,13 +193,3 @@ def client(monkeypatch):
 
     app.dependency_overrides.clear()
     Base.metadata.drop_all(bind=engine)
-    settings.ENVIRONMENT = old_environment
-    settings.EMAIL_ENABLED = old_email_enabled
-    if old_webhook_username is None:
-        os.environ.pop("WEBHOOK_USERNAME", None)
-    else:
-        os.environ["WEBHOOK_USERNAME"] = old_webhook_username
-    if old_webhook_password is None:
-        os.environ.pop("WEBHOOK_PASSWORD", None)
-    else:
-        os.environ["WEBHOOK_PASSWORD"] = old_webhook_password
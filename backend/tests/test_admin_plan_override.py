@@ -122,25 +122,19 @@ def test_admin_plan_override_success(client):
         db.close()
 
 
-def test_admin_plan_override_disabled_in_prod(client):
+def test_admin_plan_override_disabled_in_prod(client, monkeypatch):
     _, tenant_id = _register_and_login_with_tenant(client)
     admin_token = _create_and_login_super_admin(client)
     headers = {"Authorization": f"Bearer {admin_token}"}
 
-    previous_environment = settings.ENVIRONMENT
-    previous_allow_override = settings.ALLOW_ADMIN_PLAN_OVERRIDE
-    settings.ENVIRONMENT = "prod"
-    settings.ALLOW_ADMIN_PLAN_OVERRIDE = False
+    monkeypatch.setattr(settings, "ENVIRONMENT", "prod")
+    monkeypatch.setattr(settings, "ALLOW_ADMIN_PLAN_OVERRIDE", False)
 
-    try:
-        response = client.put(
-            f"/admin/tenants/{tenant_id}/plan",
-            json={"plan_type": "premium", "note": "blocked in prod"},
-            headers=headers,
-        )
-        assert response.status_code == 403, response.text
-        detail = response.json().get("detail", {})
-        assert detail.get("code") == "PLAN_OVERRIDE_DISABLED"
-    finally:
-        settings.ENVIRONMENT = previous_environment
-        settings.ALLOW_ADMIN_PLAN_OVERRIDE = previous_allow_override
+    response = client.put(
+        f"/admin/tenants/{tenant_id}/plan",
+        json={"plan_type": "premium", "note": "blocked in prod"},
+        headers=headers,
+    )
+    assert response.status_code == 403, response.text
+    detail = response.json().get("detail", {})
+    assert detail.get("code") == "PLAN_OVERRIDE_DISABLED"
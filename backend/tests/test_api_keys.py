@@ -1,10 +1,7 @@
-import re
+import uuid
 
-
-def _extract_6_digit_code(message: str) -> str:
-    match = re.search(r"(\d{6})", message or "")
-    assert match, f"Could not extract code from message: {message!r}"
-    return match.group(1)
+from app.db import session as session_module
+from app.models.user import User
 
 
 def _auth_headers(access_token: str, tenant_id: str | None = None) -> dict[str, str]:
@@ -15,7 +12,7 @@ def _auth_headers(access_token: str, tenant_id: str | None = None) -> dict[str,
 
 
 def _register_verify_login_and_create_tenant(client):
-    email = "apikeys@example.com"
+    email = f"apikeys-{uuid.uuid4().hex[:10]}@example.com"
     password = "Password123!"
 
     register_resp = client.post(
@@ -24,12 +21,14 @@ def _register_verify_login_and_create_tenant(client):
     )
     assert register_resp.status_code == 201, register_resp.text
 
-    request_code = client.post("/auth/email-verification/request", json={"email": email})
-    assert request_code.status_code == 200, request_code.text
-    code = _extract_6_digit_code(request_code.json().get("message", ""))
-
-    confirm_code = client.post("/auth/email-verification/confirm", json={"email": email, "code": code})
-    assert confirm_code.status_code == 200, confirm_code.text
+    # The verification endpoints are covered end-to-end in test_auth_two_factor;
+    # mark the user verified directly to skip two request cycles here.
+    db = session_module.SessionLocal()
+    try:
+        db.query(User).filter(User.email == email).update({"email_verified": True})
+        db.commit()
+    finally:
+        db.close()
 
     login_resp = client.post("/auth/login", json={"email": email, "password": password})
     assert login_resp.status_code == 200, login_resp.text
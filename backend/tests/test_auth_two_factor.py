@@ -1,6 +1,23 @@
+import functools
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
 from app.core.totp import generate_code
 
 
+@functools.lru_cache(maxsize=4)
+def _code_for_window(secret: str, window: int) -> str:
+    return generate_code(secret, now_ts=window * 30)
+
+
+def _code(secret: str) -> str:
+    # TOTP codes are constant within a 30-second step; compute once per step.
+    return _code_for_window(secret, int(time.time()) // 30)
+
+
 def _extract_6_digit_code(message: str) -> str:
     digits = "".join(ch for ch in (message or "") if ch.isdigit())
     return digits[-6:]
@@ -11,7 +28,8 @@ def _auth_headers(access_token: str) -> dict[str, str]:
 
 
 def _register_verify_and_login(client):
-    email = "twofactor@example.com"
+    # Unique per test: the login rate limiter is keyed on client host + email.
+    email = f"twofactor-{uuid.uuid4().hex[:10]}@example.com"
     password = "Password123!"
 
     register_resp = client.post(
@@ -35,9 +53,32 @@ def _register_verify_and_login(client):
     return email, password, access_token
 
 
-def test_two_factor_setup_and_login_flow(client):
+@pytest.fixture()
+def two_factor_user(client):
+    """Verified, logged-in user with 2FA already enabled."""
     email, password, access_token = _register_verify_and_login(client)
 
+    setup_ok = client.post(
+        "/auth/2fa/setup",
+        json={"current_password": password},
+        headers=_auth_headers(access_token),
+    )
+    assert setup_ok.status_code == 200, setup_ok.text
+    secret = setup_ok.json()["secret"]
+
+    enable_ok = client.post(
+        "/auth/2fa/enable",
+        json={"code": _code(secret)},
+        headers=_auth_headers(access_token),
+    )
+    assert enable_ok.status_code == 200, enable_ok.text
+
+    return SimpleNamespace(email=email, password=password, access_token=access_token, secret=secret)
+
+
+def test_two_factor_setup_and_enable(client):
+    _, password, access_token = _register_verify_and_login(client)
+
     status_before = client.get("/auth/2fa/status", headers=_auth_headers(access_token))
     assert status_before.status_code == 200, status_before.text
     assert status_before.json()["enabled"] is False
@@ -69,12 +110,16 @@ def test_two_factor_setup_and_login_flow(client):
 
     enable_ok = client.post(
         "/auth/2fa/enable",
-        json={"code": generate_code(secret)},
+        json={"code": _code(secret)},
         headers=_auth_headers(access_token),
     )
     assert enable_ok.status_code == 200, enable_ok.text
     assert enable_ok.json()["enabled"] is True
 
+
+def test_login_requires_two_factor_code(client, two_factor_user):
+    email, password = two_factor_user.email, two_factor_user.password
+
     login_without_2fa = client.post("/auth/login", json={"email": email, "password": password})
     assert login_without_2fa.status_code == 401, login_without_2fa.text
     assert login_without_2fa.json()["detail"]["code"] == "TWO_FACTOR_REQUIRED"
@@ -88,14 +133,24 @@ def test_two_factor_setup_and_login_flow(client):
 
     login_with_2fa = client.post(
         "/auth/login",
-        json={"email": email, "password": password, "two_factor_code": generate_code(secret)},
+        json={"email": email, "password": password, "two_factor_code": _code(two_factor_user.secret)},
+    )
+    assert login_with_2fa.status_code == 200, login_with_2fa.text
+
+
+def test_two_factor_disable(client, two_factor_user):
+    email, password, secret = two_factor_user.email, two_factor_user.password, two_factor_user.secret
+
+    login_with_2fa = client.post(
+        "/auth/login",
+        json={"email": email, "password": password, "two_factor_code": _code(secret)},
     )
     assert login_with_2fa.status_code == 200, login_with_2fa.text
     enabled_access_token = login_with_2fa.json()["access_token"]
 
     disable_wrong_password = client.post(
         "/auth/2fa/disable",
-        json={"current_password": "wrong", "code": generate_code(secret)},
+        json={"current_password": "wrong", "code": _code(secret)},
         headers=_auth_headers(enabled_access_token),
     )
     assert disable_wrong_password.status_code == 403
@@ -50,49 +50,45 @@ def _register_and_login(client) -> tuple[str, str]:
     return access_token, tenant_id
 
 
-def test_monthly_limit_enforced_for_tools_run(client):
+def test_monthly_limit_enforced_for_tools_run(client, monkeypatch):
     from app.db import session as session_module
 
-    original_free_limit = PLAN_MONTHLY_TOOL_RUN_LIMITS["free"]
-    PLAN_MONTHLY_TOOL_RUN_LIMITS["free"] = 1
+    monkeypatch.setitem(PLAN_MONTHLY_TOOL_RUN_LIMITS, "free", 1)
 
+    access_token, tenant_id = _register_and_login(client)
+    headers = {"Authorization": f"Bearer {access_token}", "X-Tenant-ID": tenant_id}
+
+    db = session_module.SessionLocal()
     try:
-        access_token, tenant_id = _register_and_login(client)
-        headers = {"Authorization": f"Bearer {access_token}", "X-Tenant-ID": tenant_id}
-
-        db = session_module.SessionLocal()
-        try:
-            seed_initial_tools(db)
-            db.add(
-                ToolRun(
-                    request_id="already-used-run",
-                    tenant_id=UUID(tenant_id),
-                    user_id=None,
-                    tool_slug="pdf_summary",
-                    status="success",
-                    tool_input_json={},
-                    output_json={"summary": "done"},
-                    usage_json={},
-                    artifacts_json=[],
-                    context_json={},
-                )
+        seed_initial_tools(db)
+        db.add(
+            ToolRun(
+                request_id="already-used-run",
+                tenant_id=UUID(tenant_id),
+                user_id=None,
+                tool_slug="pdf_summary",
+                status="success",
+                tool_input_json={},
+                output_json={"summary": "done"},
+                usage_json={},
+                artifacts_json=[],
+                context_json={},
             )
-            db.commit()
-        finally:
-            db.close()
-
-        payload = {
-            "requestId": "new-run-over-limit",
-            "toolSlug": "pdf_summary",
-            "toolInput": {"pdf_url": "https://example.com/source.pdf"},
-            "context": {"locale": "tr-TR", "timezone": "Europe/Istanbul", "channel": "web", "memory": {}},
-        }
-        response = client.post("/tools/run", json=payload, headers=headers)
-        assert response.status_code == 402, response.text
-        detail = response.json().get("detail", {})
-        assert detail.get("code") == "PLAN_LIMIT_EXCEEDED"
+        )
+        db.commit()
     finally:
-        PLAN_MONTHLY_TOOL_RUN_LIMITS["free"] = original_free_limit
+        db.close()
+
+    payload = {
+        "requestId": "new-run-over-limit",
+        "toolSlug": "pdf_summary",
+        "toolInput": {"pdf_url": "https://example.com/source.pdf"},
+        "context": {"locale": "tr-TR", "timezone": "Europe/Istanbul", "channel": "web", "memory": {}},
+    }
+    response = client.post("/tools/run", json=payload, headers=headers)
+    assert response.status_code == 402, response.text
+    detail = response.json().get("detail", {})
+    assert detail.get("code") == "PLAN_LIMIT_EXCEEDED"
 
 
 def test_billing_checkout_session_returns_url(client, monkeypatch):
@@ -115,62 +111,53 @@ def test_billing_checkout_session_returns_url(client, monkeypatch):
 def test_billing_webhook_updates_subscription_and_is_idempotent(client, monkeypatch):
     from app.db import session as session_module
 
-    previous_secret = settings.STRIPE_WEBHOOK_SECRET
-    settings.STRIPE_WEBHOOK_SECRET = "whsec_test"
+    monkeypatch.setattr(settings, "STRIPE_WEBHOOK_SECRET", "whsec_test")
 
-    try:
-        _, tenant_id = _register_and_login(client)
-
-        fake_event = SimpleNamespace(
-            id="evt_checkout_completed_1",
-            type="checkout.session.completed",
-            data=SimpleNamespace(
-                object=SimpleNamespace(
-                    metadata={"tenant_id": tenant_id, "plan_name": "pro"},
-                    client_reference_id=tenant_id,
-                    customer="cus_123",
-                    subscription="sub_123",
-                )
-            ),
-            to_dict_recursive=lambda: {"id": "evt_checkout_completed_1", "type": "checkout.session.completed"},
-        )
+    _, tenant_id = _register_and_login(client)
+
+    fake_event = SimpleNamespace(
+        id="evt_checkout_completed_1",
+        type="checkout.session.completed",
+        data=SimpleNamespace(
+            object=SimpleNamespace(
+                metadata={"tenant_id": tenant_id, "plan_name": "pro"},
+                client_reference_id=tenant_id,
+                customer="cus_123",
+                subscription="sub_123",
+            )
+        ),
+        to_dict_recursive=lambda: {"id": "evt_checkout_completed_1", "type": "checkout.session.completed"},
+    )
 
-        from app.api.routers import billing as billing_router_module
+    from app.api.routers import billing as billing_router_module
 
-        monkeypatch.setattr(
-            billing_router_module,
-            "stripe",
-            SimpleNamespace(
-                Webhook=SimpleNamespace(
-                    construct_event=lambda payload, sig_header, secret: fake_event
-                )
-            ),
-        )
+    monkeypatch.setattr(
+        billing_router_module,
+        "stripe",
+        SimpleNamespace(
+            Webhook=SimpleNamespace(
+                construct_event=lambda payload, sig_header, secret: fake_event
+            )
+        ),
+    )
 
-        response = client.post(
-            "/billing/stripe/webhook",
-            data="{}",
-            headers={"stripe-signature": "sig_test"},
-        )
-        assert response.status_code == 200, response.text
-        assert response.json().get("received") is True
-
-        db = session_module.SessionLocal()
-        try:
-            subscription = db.query(TenantSubscription).filter(TenantSubscription.tenant_id == UUID(tenant_id)).first()
-            assert subscription is not None
-            assert subscription.plan.name == "pro"
-            assert subscription.external_customer_id == "cus_123"
-            assert subscription.external_subscription_id == "sub_123"
-        finally:
-            db.close()
-
-        duplicate = client.post(
-            "/billing/stripe/webhook",
-            data="{}",
-            headers={"stripe-signature": "sig_test"},
-        )
-        assert duplicate.status_code == 200, duplicate.text
-        assert duplicate.json().get("duplicate") is True
+    db = session_module.SessionLocal()
+    try:
+        result = billing_router_module.process_stripe_event(db, fake_event)
+        assert result == {"received": True}
+
+        subscription = db.query(TenantSubscription).filter(TenantSubscription.tenant_id == UUID(tenant_id)).first()
+        assert subscription is not None
+        assert subscription.plan.name == "pro"
+        assert subscription.external_customer_id == "cus_123"
+        assert subscription.external_subscription_id == "sub_123"
     finally:
-        settings.STRIPE_WEBHOOK_SECRET = previous_secret
+        db.close()
+
+    duplicate = client.post(
+        "/billing/stripe/webhook",
+        data="{}",
+        headers={"stripe-signature": "sig_test"},
+    )
+    assert duplicate.status_code == 200, duplicate.text
+    assert duplicate.json().get("duplicate") is True
@@ -3,6 +3,10 @@ from __future__ import annotations
 import re
 from pathlib import Path
 
+from fastapi.routing import APIRoute
+
+_HTTP_METHODS = frozenset({"GET", "POST", "PUT", "PATCH", "DELETE"})
+
 
 def _canonical_path(path: str) -> str:
     path = path.strip()
@@ -32,6 +36,21 @@ def _extract_frontend_api_calls(source: str) -> set[tuple[str, str]]:
     return calls
 
 
+def _available_routes(routes, prefix: str = "") -> set[tuple[str, str]]:
+    # Walk the route objects rather than the OpenAPI schema so routes
+    # registered with include_in_schema=False still count.
+    available: set[tuple[str, str]] = set()
+    for route in routes:
+        if isinstance(route, APIRoute):
+            canonical = _canonical_path(prefix + route.path)
+            available.update((method, canonical) for method in route.methods if method in _HTTP_METHODS)
+        elif hasattr(route, "original_router"):
+            # Newer FastAPI releases keep included routers nested instead of
+            # copying their routes onto the app.
+            available |= _available_routes(route.original_router.routes, prefix + route.include_context.prefix)
+    return available
+
+
 def test_frontend_api_ts_matches_backend_routes(client):
     repo_root = Path(__file__).resolve().parents[2]
     api_ts_path = repo_root / "frontend" / "src" / "lib" / "api.ts"
@@ -40,21 +59,7 @@ def test_frontend_api_ts_matches_backend_routes(client):
     frontend_calls = _extract_frontend_api_calls(source)
     assert frontend_calls, "No frontend API calls extracted; parser may be broken."
 
-    available: set[tuple[str, str]] = set()
-    for route in client.app.routes:
-        path = getattr(route, "path", None)
-        methods = getattr(route, "methods", None)
-        if not path or not methods:
-            continue
-        canonical = _canonical_path(path)
-        for method in methods:
-            if method in {"HEAD", "OPTIONS"}:
-                continue
-            available.add((method.upper(), canonical))
-
-    missing: list[str] = []
-    for method, path in sorted(frontend_calls):
-        if (method, path) not in available:
-            missing.append(f"{method} {path}")
+    available = _available_routes(client.app.routes)
+    missing = sorted(f"{method} {path}" for method, path in frontend_calls - available)
 
     assert not missing, "Frontend api.ts contains missing backend routes:\\n" + "\\n".join(missing)
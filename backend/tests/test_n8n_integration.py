@@ -7,15 +7,44 @@ Tests for n8n integration features:
 
 import pytest
 import uuid
-import asyncio
+import contextlib
+import functools
+import inspect
 from unittest.mock import MagicMock, AsyncMock, patch
 from datetime import datetime
-import time
+from types import SimpleNamespace
+
+
+# Fixed identifiers for tests where the value itself is never inspected.
+_TENANT = uuid.UUID("00000000-0000-0000-0000-000000000001")
+_RUN_ID = uuid.UUID("00000000-0000-0000-0000-000000000002")
+
+
+@functools.lru_cache(maxsize=None)
+def _source_of(obj) -> str:
+    """Read and cache an object's source so repeated checks skip file I/O."""
+    return inspect.getsource(obj)
+
+
+@pytest.fixture(scope="class")
+def shared_client_and_db():
+    """Build the mock DB and N8NClient once per test class."""
+    from app.services.n8n_client import N8NClient
+
+    mock_db = MagicMock()
+    return N8NClient(mock_db), mock_db
 
 
 class TestIdempotency:
     """Test idempotency / duplicate message handling."""
     
+    @pytest.fixture()
+    def client_and_db(self, shared_client_and_db):
+        """Hand out the shared client with the mock DB's state cleared."""
+        _, mock_db = shared_client_and_db
+        mock_db.reset_mock(return_value=True, side_effect=True)
+        return shared_client_and_db
+    
     def test_idempotent_statuses_defined(self):
         """Test that idempotent statuses are correctly defined."""
         from app.services.n8n_client import IDEMPOTENT_STATUSES
@@ -30,16 +59,11 @@ class TestIdempotency:
         assert AutomationRunStatus.FAILED.value not in IDEMPOTENT_STATUSES
         assert AutomationRunStatus.TIMEOUT.value not in IDEMPOTENT_STATUSES
     
-    def test_create_automation_run_returns_tuple(self):
+    def test_create_automation_run_returns_tuple(self, client_and_db):
         """Test that create_automation_run returns (run, is_new) tuple."""
-        from app.services.n8n_client import N8NClient
-        
-        # Mock DB session
-        mock_db = MagicMock()
+        client, mock_db = client_and_db
         mock_db.query.return_value.filter.return_value.first.return_value = None
         
-        client = N8NClient(mock_db)
-        
         # Mock the methods that interact with DB
         with patch.object(client, 'check_duplicate_message', return_value=(False, None)):
             # Simulate successful add
@@ -48,7 +72,7 @@ class TestIdempotency:
             mock_db.refresh = MagicMock()
             
             run, is_new = client.create_automation_run(
-                tenant_id=uuid.uuid4(),
+                tenant_id=_TENANT,
                 channel="whatsapp",
                 from_number="+1234567890",
                 to_number="+0987654321",
@@ -61,40 +85,35 @@ class TestIdempotency:
             assert is_new is True
             assert run is not None
     
-    def test_duplicate_detection_logic(self):
+    def test_duplicate_detection_logic(self, client_and_db):
         """Test duplicate message detection logic."""
-        from app.services.n8n_client import N8NClient
-        from app.models.automation import AutomationRun, AutomationRunStatus
+        from app.models.automation import AutomationRunStatus
         
-        mock_db = MagicMock()
+        client, mock_db = client_and_db
         
-        # Create a mock existing run
-        existing_run = MagicMock(spec=AutomationRun)
-        existing_run.id = str(uuid.uuid4())
-        existing_run.status = AutomationRunStatus.RECEIVED.value
+        # Only id/status are read, so a plain namespace stands in for the run
+        existing_run = SimpleNamespace(
+            id=str(_RUN_ID),
+            status=AutomationRunStatus.RECEIVED.value,
+        )
         
         # Mock query to return existing run
         mock_db.query.return_value.filter.return_value.first.return_value = existing_run
         
-        client = N8NClient(mock_db)
-        
         is_dup, found_run = client.check_duplicate_message(
-            tenant_id=uuid.uuid4(),
+            tenant_id=_TENANT,
             message_id="wamid.existing"
         )
         
         assert is_dup is True
         assert found_run == existing_run
     
-    def test_null_message_id_skips_duplicate_check(self):
+    def test_null_message_id_skips_duplicate_check(self, client_and_db):
         """Test that null message_id skips duplicate check."""
-        from app.services.n8n_client import N8NClient
-        
-        mock_db = MagicMock()
-        client = N8NClient(mock_db)
+        client, mock_db = client_and_db
         
         is_dup, found_run = client.check_duplicate_message(
-            tenant_id=uuid.uuid4(),
+            tenant_id=_TENANT,
             message_id=None  # null message_id
         )
         
@@ -123,7 +142,7 @@ class TestWebhookTimeout:
                 from app.services.n8n_client import trigger_n8n_in_background
                 
                 await trigger_n8n_in_background(
-                    tenant_id=uuid.uuid4(),
+                    tenant_id=_TENANT,
                     from_number="+1234567890",
                     to_number="+0987654321",
                     text="Test message",
@@ -141,107 +160,100 @@ class TestWebhookTimeout:
         """Test that webhook handler patterns allow immediate return."""
         from fastapi import BackgroundTasks
         
-        start_time = time.time()
-        
-        # Create background tasks object
         background_tasks = BackgroundTasks()
         
-        # Adding a task should be nearly instant
-        async def slow_task():
-            await asyncio.sleep(5)
+        async def noop():
+            pass
         
-        background_tasks.add_task(slow_task)
+        # Adding a task only queues it; nothing runs until the response is sent
+        background_tasks.add_task(noop)
         
-        elapsed = time.time() - start_time
-        
-        # Adding task should be instant (< 100ms)
-        assert elapsed < 0.1, f"Adding background task took {elapsed}s"
+        assert len(background_tasks.tasks) == 1
+
+
+_INSECURE_JWT_SECRET = "your-super-secret-jwt-key-change-in-production"
+_INSECURE_SVONTAI_TO_N8N_SECRET = "change-this-to-a-secure-random-string-svontai-to-n8n"
+_SECURE_VOICE_GATEWAY_SECRET = "secure-voice-gateway-to-svontai-secret!"
 
 
 class TestProductionSecretValidation:
     """Test production secret validation."""
     
     def test_insecure_default_secrets_list_exists(self):
-        """Test that insecure default secrets list is defined."""
-        from app.core.config import INSECURE_DEFAULT_SECRETS
-        
-        assert isinstance(INSECURE_DEFAULT_SECRETS, list)
-        assert len(INSECURE_DEFAULT_SECRETS) > 0
-        
-        # Verify our known insecure defaults are in the list
-        assert "change-this-to-a-secure-random-string-svontai-to-n8n" in INSECURE_DEFAULT_SECRETS
-        assert "change-this-to-a-secure-random-string-n8n-to-svontai" in INSECURE_DEFAULT_SECRETS
-        assert "your-super-secret-jwt-key-change-in-production" in INSECURE_DEFAULT_SECRETS
+        """Test that our known insecure defaults are in the set."""
+        from app.core.config import INSECURE_DEFAULT_SECRETS, INSECURE_DEFAULT_SECRETS_SET
+        
+        assert INSECURE_DEFAULT_SECRETS_SET == frozenset(INSECURE_DEFAULT_SECRETS)
+        assert {
+            "change-this-to-a-secure-random-string-svontai-to-n8n",
+            "change-this-to-a-secure-random-string-n8n-to-svontai",
+            "your-super-secret-jwt-key-change-in-production",
+        } <= INSECURE_DEFAULT_SECRETS_SET
     
-    def test_insecure_jwt_secret_fails_in_production(self):
-        """Test that insecure JWT secret fails in production."""
+    @pytest.mark.parametrize(
+        ("overrides", "expected_error"),
+        [
+            pytest.param(
+                {"ENVIRONMENT": "prod", "JWT_SECRET_KEY": _INSECURE_JWT_SECRET},
+                "JWT_SECRET_KEY",
+                id="insecure-jwt-fails-in-prod",
+            ),
+            pytest.param(
+                {
+                    "ENVIRONMENT": "prod",
+                    "JWT_SECRET_KEY": "secure-jwt-key-32-chars-minimum!",
+                    "USE_N8N": True,
+                    "SVONTAI_TO_N8N_SECRET": _INSECURE_SVONTAI_TO_N8N_SECRET,
+                },
+                "SVONTAI_TO_N8N_SECRET",
+                id="insecure-n8n-fails-when-enabled",
+            ),
+            pytest.param(
+                {
+                    "ENVIRONMENT": "prod",
+                    "JWT_SECRET_KEY": "secure-jwt-key-32-chars-minimum!",
+                    "USE_N8N": False,
+                    "SVONTAI_TO_N8N_SECRET": _INSECURE_SVONTAI_TO_N8N_SECRET,
+                    "VOICE_GATEWAY_TO_SVONTAI_SECRET": _SECURE_VOICE_GATEWAY_SECRET,
+                },
+                None,
+                id="insecure-n8n-allowed-when-disabled",
+            ),
+            pytest.param(
+                {
+                    "ENVIRONMENT": "prod",
+                    "JWT_SECRET_KEY": "my-super-secure-jwt-key-for-prod",
+                    "USE_N8N": True,
+                    "SVONTAI_TO_N8N_SECRET": "secure-svontai-to-n8n-secret!",
+                    "N8N_TO_SVONTAI_SECRET": "secure-n8n-to-svontai-secret!",
+                    "VOICE_GATEWAY_TO_SVONTAI_SECRET": _SECURE_VOICE_GATEWAY_SECRET,
+                },
+                None,
+                id="secure-secrets-work-in-prod",
+            ),
+            pytest.param(
+                {"ENVIRONMENT": "dev", "JWT_SECRET_KEY": _INSECURE_JWT_SECRET, "USE_N8N": False},
+                None,
+                id="insecure-secrets-allowed-in-dev",
+            ),
+        ],
+    )
+    def test_settings_secret_validation(self, overrides, expected_error):
+        """Test that insecure secrets are rejected only where they matter."""
         from pydantic import ValidationError
         from app.core.config import Settings
         
-        with pytest.raises(ValidationError) as exc_info:
-            Settings(
-                ENVIRONMENT="prod",
-                JWT_SECRET_KEY="your-super-secret-jwt-key-change-in-production"
-            )
-        
-        # Should mention JWT_SECRET_KEY in error
-        error_str = str(exc_info.value)
-        assert "JWT_SECRET_KEY" in error_str or "insecure" in error_str.lower()
-    
-    def test_insecure_n8n_secrets_fail_when_enabled(self):
-        """Test that insecure n8n secrets fail in production when n8n enabled."""
-        from pydantic import ValidationError
-        from app.core.config import Settings
-        
-        # Test SVONTAI_TO_N8N_SECRET
-        with pytest.raises(ValidationError):
-            Settings(
-                ENVIRONMENT="prod",
-                JWT_SECRET_KEY="secure-jwt-key-32-chars-minimum!",
-                USE_N8N=True,
-                SVONTAI_TO_N8N_SECRET="change-this-to-a-secure-random-string-svontai-to-n8n"
-            )
-    
-    def test_insecure_n8n_secrets_allowed_when_disabled(self):
-        """Test that insecure n8n secrets are allowed when n8n disabled."""
-        from app.core.config import Settings
-        
-        # Should NOT raise when USE_N8N=False
-        settings = Settings(
-            ENVIRONMENT="prod",
-            JWT_SECRET_KEY="secure-jwt-key-32-chars-minimum!",
-            USE_N8N=False,
-            SVONTAI_TO_N8N_SECRET="change-this-to-a-secure-random-string-svontai-to-n8n"
-        )
-        
-        assert settings.USE_N8N is False
-    
-    def test_secure_secrets_work_in_production(self):
-        """Test that secure secrets work in production."""
-        from app.core.config import Settings
-        
-        settings = Settings(
-            ENVIRONMENT="prod",
-            JWT_SECRET_KEY="my-super-secure-jwt-key-for-prod",
-            USE_N8N=True,
-            SVONTAI_TO_N8N_SECRET="secure-svontai-to-n8n-secret!",
-            N8N_TO_SVONTAI_SECRET="secure-n8n-to-svontai-secret!"
-        )
-        
-        assert settings.ENVIRONMENT == "prod"
-        assert settings.USE_N8N is True
-    
-    def test_insecure_secrets_allowed_in_dev(self):
-        """Test that insecure secrets are allowed in development."""
-        from app.core.config import Settings
-        
-        # Should NOT raise in dev environment
-        settings = Settings(
-            ENVIRONMENT="dev",
-            JWT_SECRET_KEY="your-super-secret-jwt-key-change-in-production"
+        expectation = (
+            pytest.raises(ValidationError, match=expected_error)
+            if expected_error
+            else contextlib.nullcontext()
         )
+        with expectation:
+            settings = Settings(**overrides)
         
-        assert settings.ENVIRONMENT == "dev"
+        if expected_error is None:
+            assert settings.ENVIRONMENT == overrides["ENVIRONMENT"]
+            assert settings.USE_N8N is overrides["USE_N8N"]
 
 
 class TestConstantTimeCompare:
@@ -249,10 +261,9 @@ class TestConstantTimeCompare:
     
     def test_signature_uses_hmac_compare_digest(self):
         """Verify signature verification uses hmac.compare_digest."""
-        import inspect
         from app.core.n8n_security import verify_signature
         
-        source = inspect.getsource(verify_signature)
+        source = _source_of(verify_signature)
         
         assert "hmac.compare_digest" in source, \
             "verify_signature should use hmac.compare_digest for constant-time comparison"
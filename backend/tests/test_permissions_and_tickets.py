@@ -1,5 +1,4 @@
 import uuid
-from datetime import datetime
 from types import SimpleNamespace
 from unittest.mock import MagicMock
 
@@ -9,6 +8,10 @@ from fastapi import HTTPException
 from app.dependencies.permissions import require_permissions
 from app.api.routers.tickets import add_ticket_message
 from app.schemas.ticket import TicketMessageCreate
+from tests._fakes import FakeQuery, FakeSession
+
+# add_ticket_message only reads the payload, so one validated instance is reused.
+_REPLY_PAYLOAD = TicketMessageCreate(body="Test reply")
 
 
 @pytest.mark.asyncio
@@ -53,27 +56,14 @@ async def test_add_ticket_message_sets_staff_sender_type():
     ticket_id = uuid.uuid4()
     ticket = SimpleNamespace(id=str(ticket_id), tenant_id="tenant-1", last_activity_at=None)
 
-    query = MagicMock()
-    query.filter.return_value = query
-    query.first.return_value = ticket
-
-    db = MagicMock()
-    db.query.return_value = query
-
-    def refresh(obj):
-        obj.created_at = datetime.utcnow()
-        if getattr(obj, "id", None) is None:
-            obj.id = str(uuid.uuid4())
-
-    db.refresh.side_effect = refresh
+    db = FakeSession(FakeQuery(first=ticket))
 
     current_user = SimpleNamespace(id="user-1", is_admin=True)
     current_tenant = SimpleNamespace(id="tenant-1")
-    payload = TicketMessageCreate(body="Test reply")
 
     response = await add_ticket_message(
         ticket_id=ticket_id,
-        payload=payload,
+        payload=_REPLY_PAYLOAD,
         current_user=current_user,
         current_tenant=current_tenant,
         db=db
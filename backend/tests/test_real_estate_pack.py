@@ -1,38 +1,31 @@
 from __future__ import annotations
 
-import copy
 from datetime import datetime
+from types import SimpleNamespace
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
-
-from app.core.encryption import decrypt_token
-from app.db.base import Base
-import app.models  # noqa: F401
-from app.models.bot import Bot
-from app.models.conversation import Conversation, ConversationSource
-from app.models.lead import Lead
-from app.models.real_estate import RealEstateLeadListingEvent, RealEstateListing
-from app.models.tenant import Tenant
-from app.models.user import User
-from app.services.pdf_service import SimplePdfService
-from app.services.real_estate_service import RealEstateService
-
-
-def _build_session():
-    engine = create_engine(
-        "sqlite+pysqlite://",
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-    )
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    Base.metadata.create_all(bind=engine)
-    return SessionLocal()
+import pytest
+
+_SHEETS_CSV = (
+    "id,title,sale_rent,property_type,location_text,price,currency,m2,rooms,url\n"
+    "X1,Çankaya Güncel İlan,sale,daire,Ankara Çankaya,3100000,TRY,120,3+1,https://example.com/x1\n"
+    "X2,Yeni İlan,rent,daire,Ankara Keçiören,24000,TRY,95,2+1,https://example.com/x2\n"
+)
+
+
+@pytest.fixture()
+def re_world(db, owner, tenant, bot, conversation):
+    """Owner, tenant, bot and WhatsApp conversation with the pack enabled."""
+    from app.services.real_estate_service import RealEstateService
+
+    db.commit()
+    RealEstateService(db).upsert_settings(tenant.id, {"enabled": True, "persona": "pro"})
 
+    return SimpleNamespace(owner=owner, tenant=tenant, bot=bot, conversation=conversation)
+
+
+def test_real_estate_intent_parser_extracts_core_fields(db):
+    from app.services.real_estate_service import RealEstateService
 
-def test_real_estate_intent_parser_extracts_core_fields():
-    db = _build_session()
     service = RealEstateService(db)
 
     parsed = service.parse_message("Ankara Çankaya'da satılık 3+1 daire bakıyorum, bütçe 4-5 milyon, 140 m2")
@@ -45,39 +38,13 @@ def test_real_estate_intent_parser_extracts_core_fields():
     assert parsed["rooms"] == "3+1"
     assert parsed["m2_min"] == 140
 
-    db.close()
 
+def test_real_estate_state_machine_matches_listings(db, re_world):
+    from app.models.real_estate import RealEstateListing
+    from app.services.real_estate_service import RealEstateService
 
-def test_real_estate_state_machine_matches_listings():
-    db = _build_session()
     service = RealEstateService(db)
-
-    owner = User(
-        email="owner@test.com",
-        password_hash="hash",
-        full_name="Owner",
-        is_admin=False,
-        is_active=True,
-    )
-    db.add(owner)
-    db.flush()
-
-    tenant = Tenant(name="Acme Homes", owner_id=owner.id, settings={})
-    db.add(tenant)
-    db.flush()
-
-    bot = Bot(tenant_id=tenant.id, name="Homes Bot", welcome_message="Merhaba!")
-    db.add(bot)
-    db.flush()
-
-    conversation = Conversation(
-        bot_id=bot.id,
-        external_user_id="+905551112233",
-        source=ConversationSource.WHATSAPP.value,
-        extra_data={},
-    )
-    db.add(conversation)
-    db.flush()
+    owner, tenant = re_world.owner, re_world.tenant
 
     listing = RealEstateListing(
         tenant_id=tenant.id,
@@ -98,12 +65,10 @@ def test_real_estate_state_machine_matches_listings():
     db.add(listing)
     db.commit()
 
-    service.upsert_settings(tenant.id, {"enabled": True, "persona": "pro"})
-
     result = service.handle_inbound_whatsapp_message(
         tenant_id=tenant.id,
-        bot=bot,
-        conversation=conversation,
+        bot=re_world.bot,
+        conversation=re_world.conversation,
         from_number="+90 555 111 22 33",
         contact_name="Ali",
         text="Ankara Çankaya'da satılık 3+1 daire arıyorum, bütçe 5 milyon",
@@ -114,41 +79,18 @@ def test_real_estate_state_machine_matches_listings():
     assert "Çankaya 3+1 Ferah Daire" in result.response_text
     assert "https://example.com/listing-1" in result.response_text
 
-    db.close()
 
+def test_personalized_suggestions_boost_clicked_history(db, re_world):
+    from sqlalchemy import insert, select
 
-def test_personalized_suggestions_boost_clicked_history():
-    db = _build_session()
-    service = RealEstateService(db)
+    from app.models.lead import Lead
+    from app.models.real_estate import RealEstateLeadListingEvent, RealEstateListing
+    from app.services.real_estate_service import RealEstateService
 
-    owner = User(
-        email="owner2@test.com",
-        password_hash="hash",
-        full_name="Owner2",
-        is_admin=False,
-        is_active=True,
-    )
-    db.add(owner)
-    db.flush()
-
-    tenant = Tenant(name="Acme Homes 2", owner_id=owner.id, settings={})
-    db.add(tenant)
-    db.flush()
-
-    bot = Bot(tenant_id=tenant.id, name="Homes Bot 2", welcome_message="Merhaba!")
-    db.add(bot)
-    db.flush()
-
-    conversation = Conversation(
-        bot_id=bot.id,
-        external_user_id="+905551119999",
-        source=ConversationSource.WHATSAPP.value,
-        extra_data={},
-    )
-    db.add(conversation)
-    db.flush()
+    service = RealEstateService(db)
+    owner, tenant = re_world.owner, re_world.tenant
 
-    listing_1 = RealEstateListing(
+    listing_1 = dict(
         tenant_id=tenant.id,
         created_by=owner.id,
         title="Çankaya 3+1 Daire A",
@@ -164,7 +106,7 @@ def test_personalized_suggestions_boost_clicked_history():
         url="https://example.com/listing-a",
         is_active=True,
     )
-    listing_2 = RealEstateListing(
+    listing_2 = dict(
         tenant_id=tenant.id,
         created_by=owner.id,
         title="Çankaya 3+1 Daire B",
@@ -180,28 +122,29 @@ def test_personalized_suggestions_boost_clicked_history():
         url="https://example.com/listing-b",
         is_active=True,
     )
-    db.add(listing_1)
-    db.add(listing_2)
+    _, listing_2_id = db.scalars(
+        insert(RealEstateListing).returning(RealEstateListing.id, sort_by_parameter_order=True),
+        [listing_1, listing_2],
+    ).all()
     db.commit()
 
-    service.upsert_settings(tenant.id, {"enabled": True, "persona": "pro"})
     service.handle_inbound_whatsapp_message(
         tenant_id=tenant.id,
-        bot=bot,
-        conversation=conversation,
-        from_number="+90 555 111 99 99",
+        bot=re_world.bot,
+        conversation=re_world.conversation,
+        from_number="+90 555 111 22 33",
         contact_name="Ayşe",
         text="Ankara Çankaya'da satılık 3+1 daire arıyorum, bütçe 5 milyon",
     )
 
-    lead = db.query(Lead).filter(Lead.tenant_id == tenant.id).first()
+    lead = db.scalars(select(Lead).where(Lead.tenant_id == tenant.id)).first()
     assert lead is not None
 
     db.add(
         RealEstateLeadListingEvent(
             tenant_id=tenant.id,
             lead_id=lead.id,
-            listing_id=listing_2.id,
+            listing_id=listing_2_id,
             event="clicked",
             meta_json={},
         )
@@ -210,37 +153,33 @@ def test_personalized_suggestions_boost_clicked_history():
 
     suggestions = service.suggest_listings_for_lead(tenant.id, lead.id)
     assert suggestions
-    assert suggestions[0].id == listing_2.id
+    assert suggestions[0].id == listing_2_id
+
+
+def test_simple_pdf_service_header():
+    from app.services.pdf_service import SimplePdfService
 
-    db.close()
+    assert SimplePdfService.header_bytes().startswith(b"%PDF-")
 
 
-def test_simple_pdf_service_returns_valid_header():
+@pytest.mark.slow
+def test_simple_pdf_service_full_build():
+    from app.services.pdf_service import SimplePdfService
+
     pdf_bytes = SimplePdfService.build_text_pdf(
         title="SvontAI Test PDF",
         lines=["Satir 1", "Satir 2"],
         footer="Footer",
     )
-    assert pdf_bytes.startswith(b"%PDF-")
-
+    assert pdf_bytes.startswith(SimplePdfService.header_bytes())
+    assert pdf_bytes.endswith(b"%%EOF\n")
 
-def test_pdf_limit_is_enforced():
-    db = _build_session()
-    service = RealEstateService(db)
 
-    owner = User(
-        email="owner3@test.com",
-        password_hash="hash",
-        full_name="Owner3",
-        is_admin=False,
-        is_active=True,
-    )
-    db.add(owner)
-    db.flush()
+def test_pdf_limit_is_enforced(db, owner, tenant):
+    from app.models.real_estate import RealEstateListing
+    from app.services.real_estate_service import RealEstateService
 
-    tenant = Tenant(name="Acme Homes 3", owner_id=owner.id, settings={})
-    db.add(tenant)
-    db.flush()
+    service = RealEstateService(db)
 
     listing = RealEstateListing(
         tenant_id=tenant.id,
@@ -271,27 +210,12 @@ def test_pdf_limit_is_enforced():
     except ValueError as exc:
         assert str(exc) == "pdf_limit_reached"
 
-    db.close()
 
+def test_available_slots_manual_availability(db, owner, tenant):
+    from app.services.real_estate_service import RealEstateService
 
-def test_available_slots_manual_availability():
-    db = _build_session()
     service = RealEstateService(db)
 
-    owner = User(
-        email="owner4@test.com",
-        password_hash="hash",
-        full_name="Owner4",
-        is_admin=False,
-        is_active=True,
-    )
-    db.add(owner)
-    db.flush()
-
-    tenant = Tenant(name="Acme Homes 4", owner_id=owner.id, settings={})
-    db.add(tenant)
-    db.flush()
-
     service.upsert_settings(
         tenant.id,
         {
@@ -314,30 +238,20 @@ def test_available_slots_manual_availability():
         step_minutes=60,
     )
 
-    assert any(slot["start_at"].startswith("2026-02-16T10:00") for slot in slots)
-    assert any(slot["start_at"].startswith("2026-02-16T11:00") for slot in slots)
-    assert not any(slot["start_at"].startswith("2026-02-16T09:00") for slot in slots)
-
-    db.close()
+    # start_at is fixed-width ISO 8601, so the first 16 chars are YYYY-MM-DDTHH:MM.
+    starts = {slot["start_at"][:16] for slot in slots}
+    assert "2026-02-16T10:00" in starts
+    assert "2026-02-16T11:00" in starts
+    assert "2026-02-16T09:00" not in starts
 
 
-def test_google_sheets_sync_creates_and_updates_listings():
-    db = _build_session()
-    service = RealEstateService(db)
+def test_google_sheets_sync_creates_and_updates_listings(db, owner, tenant):
+    from sqlalchemy import select
 
-    owner = User(
-        email="owner-sheets@test.com",
-        password_hash="hash",
-        full_name="Owner Sheets",
-        is_admin=False,
-        is_active=True,
-    )
-    db.add(owner)
-    db.flush()
+    from app.models.real_estate import RealEstateListing
+    from app.services.real_estate_service import RealEstateService
 
-    tenant = Tenant(name="Sheets Tenant", owner_id=owner.id, settings={})
-    db.add(tenant)
-    db.flush()
+    service = RealEstateService(db)
 
     existing = RealEstateListing(
         tenant_id=tenant.id,
@@ -358,12 +272,7 @@ def test_google_sheets_sync_creates_and_updates_listings():
     db.add(existing)
     db.commit()
 
-    csv_text = (
-        "id,title,sale_rent,property_type,location_text,price,currency,m2,rooms,url\n"
-        "X1,Çankaya Güncel İlan,sale,daire,Ankara Çankaya,3100000,TRY,120,3+1,https://example.com/x1\n"
-        "X2,Yeni İlan,rent,daire,Ankara Keçiören,24000,TRY,95,2+1,https://example.com/x2\n"
-    )
-    service._http_get_text = lambda url, headers=None: csv_text  # type: ignore[assignment]
+    service._http_get_text = lambda url, headers=None: _SHEETS_CSV  # type: ignore[assignment]
 
     result = service.sync_listings_from_google_sheets(
         tenant_id=tenant.id,
@@ -379,7 +288,9 @@ def test_google_sheets_sync_creates_and_updates_listings():
     assert result["stats"]["created"] == 1
     assert result["stats"]["skipped"] == 0
 
-    listings = db.query(RealEstateListing).filter(RealEstateListing.tenant_id == tenant.id).all()
+    listings = db.scalars(
+        select(RealEstateListing).where(RealEstateListing.tenant_id == tenant.id)
+    ).all()
     assert len(listings) == 2
     updated = next(
         (
@@ -398,28 +309,17 @@ def test_google_sheets_sync_creates_and_updates_listings():
     assert google_cfg.get("enabled") is True
     assert google_cfg.get("last_sync_at")
 
-    db.close()
-
 
-def test_remax_sync_deactivates_missing_and_encrypts_api_key():
-    db = _build_session()
-    service = RealEstateService(db)
+def test_remax_sync_deactivates_missing_and_encrypts_api_key(db, owner, tenant):
+    from sqlalchemy import insert
 
-    owner = User(
-        email="owner-remax@test.com",
-        password_hash="hash",
-        full_name="Owner Remax",
-        is_admin=False,
-        is_active=True,
-    )
-    db.add(owner)
-    db.flush()
+    from app.core.encryption import decrypt_token
+    from app.models.real_estate import RealEstateListing
+    from app.services.real_estate_service import RealEstateService
 
-    tenant = Tenant(name="Remax Tenant", owner_id=owner.id, settings={})
-    db.add(tenant)
-    db.flush()
+    service = RealEstateService(db)
 
-    listing_a = RealEstateListing(
+    listing_a = dict(
         tenant_id=tenant.id,
         created_by=owner.id,
         title="A İlan",
@@ -435,7 +335,7 @@ def test_remax_sync_deactivates_missing_and_encrypts_api_key():
         url="https://example.com/a",
         is_active=True,
     )
-    listing_b = RealEstateListing(
+    listing_b = dict(
         tenant_id=tenant.id,
         created_by=owner.id,
         title="B İlan",
@@ -451,8 +351,10 @@ def test_remax_sync_deactivates_missing_and_encrypts_api_key():
         url="https://example.com/b",
         is_active=True,
     )
-    db.add(listing_a)
-    db.add(listing_b)
+    listing_a_id, listing_b_id = db.scalars(
+        insert(RealEstateListing).returning(RealEstateListing.id, sort_by_parameter_order=True),
+        [listing_a, listing_b],
+    ).all()
     db.commit()
 
     service._http_get_json = lambda url, headers=None: {  # type: ignore[assignment]
@@ -490,8 +392,8 @@ def test_remax_sync_deactivates_missing_and_encrypts_api_key():
     assert result["stats"]["updated"] == 1
     assert result["stats"]["deactivated"] == 1
 
-    refreshed_a = db.query(RealEstateListing).filter(RealEstateListing.id == listing_a.id).first()
-    refreshed_b = db.query(RealEstateListing).filter(RealEstateListing.id == listing_b.id).first()
+    refreshed_a = db.get(RealEstateListing, listing_a_id, populate_existing=True)
+    refreshed_b = db.get(RealEstateListing, listing_b_id, populate_existing=True)
     assert refreshed_a is not None and refreshed_a.is_active is True
     assert refreshed_a.title == "A İlan Güncel"
     assert refreshed_b is not None and refreshed_b.is_active is False
@@ -503,27 +405,12 @@ def test_remax_sync_deactivates_missing_and_encrypts_api_key():
     assert decrypt_token(encrypted) == "secret-key-123"
     assert not remax_cfg.get("api_key")
 
-    db.close()
 
+def test_connector_auto_sync_runs_only_when_due(db, owner, tenant):
+    from app.services.real_estate_service import RealEstateService
 
-def test_connector_auto_sync_runs_only_when_due():
-    db = _build_session()
     service = RealEstateService(db)
 
-    owner = User(
-        email="owner-auto-sync@test.com",
-        password_hash="hash",
-        full_name="Owner Auto",
-        is_admin=False,
-        is_active=True,
-    )
-    db.add(owner)
-    db.flush()
-
-    tenant = Tenant(name="Auto Sync Tenant", owner_id=owner.id, settings={})
-    db.add(tenant)
-    db.flush()
-
     service.upsert_settings(
         tenant.id,
         {
@@ -546,14 +433,15 @@ def test_connector_auto_sync_runs_only_when_due():
     )
 
     calls: list[str] = []
+    synced_at = datetime.utcnow().isoformat()
 
     def fake_google(tenant_id, user_id, config):
         calls.append("google")
-        return {"source": "google_sheets", "stats": {"created": 1, "updated": 0, "deactivated": 0, "skipped": 0}, "synced_at": datetime.utcnow().isoformat()}
+        return {"source": "google_sheets", "stats": {"created": 1, "updated": 0, "deactivated": 0, "skipped": 0}, "synced_at": synced_at}
 
     def fake_remax(tenant_id, user_id, config):
         calls.append("remax")
-        return {"source": "remax_connector", "stats": {"created": 1, "updated": 0, "deactivated": 0, "skipped": 0}, "synced_at": datetime.utcnow().isoformat()}
+        return {"source": "remax_connector", "stats": {"created": 1, "updated": 0, "deactivated": 0, "skipped": 0}, "synced_at": synced_at}
 
     service.sync_listings_from_google_sheets = fake_google  # type: ignore[assignment]
     service.sync_listings_from_remax_connector = fake_remax  # type: ignore[assignment]
@@ -564,10 +452,14 @@ def test_connector_auto_sync_runs_only_when_due():
     assert result_first["remax_connector"]["status"] == "ok"
 
     settings = service.get_or_create_settings(tenant.id)
-    source = copy.deepcopy(settings.listings_source)
-    source["google_sheets"]["last_sync_at"] = datetime.utcnow().isoformat()
-    source["remax_connector"]["last_sync_at"] = datetime.utcnow().isoformat()
-    settings.listings_source = source
+    source = settings.listings_source
+    # Rebuild only the touched branches; a fresh top-level dict is enough for
+    # SQLAlchemy to see the JSON column as changed.
+    settings.listings_source = {
+        **source,
+        "google_sheets": {**source["google_sheets"], "last_sync_at": synced_at},
+        "remax_connector": {**source["remax_connector"], "last_sync_at": synced_at},
+    }
     db.commit()
 
     calls.clear()
@@ -577,5 +469,3 @@ def test_connector_auto_sync_runs_only_when_due():
     assert result_second["google_sheets"]["reason"] == "not_due"
     assert result_second["remax_connector"]["status"] == "skipped"
     assert result_second["remax_connector"]["reason"] == "not_due"
-
-    db.close()
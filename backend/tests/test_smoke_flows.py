@@ -1,9 +1,12 @@
 import re
+import uuid
 from datetime import datetime, timedelta, timezone
 
+_CODE_RE = re.compile(r"(\d{6})")
+
 
 def _extract_6_digit_code(message: str) -> str:
-    match = re.search(r"(\d{6})", message or "")
+    match = _CODE_RE.search(message or "")
     assert match, f"Could not extract verification code from message: {message!r}"
     return match.group(1)
 
@@ -16,7 +19,7 @@ def _auth_headers(access_token: str, tenant_id: str | None = None) -> dict[str,
 
 
 def test_smoke_register_verify_login_and_core_resources(client):
-    email = "user1@example.com"
+    email = f"user1-{uuid.uuid4().hex[:10]}@example.com"
     password = "Password123!"
     full_name = "User One"
 
@@ -118,7 +121,7 @@ def test_smoke_register_verify_login_and_core_resources(client):
 
 
 def test_smoke_password_reset_flow(client):
-    email = "user2@example.com"
+    email = f"user2-{uuid.uuid4().hex[:10]}@example.com"
     password = "Password123!"
     full_name = "User Two"
 
@@ -1,10 +1,27 @@
-import json
 import uuid
 from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
+import pytest
+
 from app.services.subscription_service import SubscriptionService
 from app.core import n8n_security
+from tests._fakes import FakeQuery, FakeSession
+
+# Canonical (sorted, compact) JSON for {"hello": "world"}.
+_PAYLOAD_BYTES = b'{"hello":"world"}'
+_N8N_SECRET = "secret"
+
+
+@pytest.fixture()
+def n8n_secret(monkeypatch):
+    monkeypatch.setattr(n8n_security.settings, "N8N_TO_SVONTAI_SECRET", _N8N_SECRET)
+    return _N8N_SECRET
+
+
+@pytest.fixture(scope="module")
+def signed_payload():
+    return n8n_security.generate_signature(_PAYLOAD_BYTES.decode(), _N8N_SECRET)
 
 
 def test_check_feature_returns_true_when_enabled():
@@ -12,12 +29,7 @@ def test_check_feature_returns_true_when_enabled():
     plan = SimpleNamespace(feature_flags={"operator_takeover": True})
     subscription = SimpleNamespace(plan=plan)
 
-    query = MagicMock()
-    query.filter.return_value = query
-    query.first.return_value = subscription
-
-    db = MagicMock()
-    db.query.return_value = query
+    db = FakeSession(FakeQuery(first=subscription))
 
     service = SubscriptionService(db)
     assert service.check_feature(tenant_id, "operator_takeover") is True
@@ -26,12 +38,7 @@ def test_check_feature_returns_true_when_enabled():
 def test_check_feature_returns_false_without_subscription():
     tenant_id = uuid.uuid4()
 
-    query = MagicMock()
-    query.filter.return_value = query
-    query.first.return_value = None
-
-    db = MagicMock()
-    db.query.return_value = query
+    db = FakeSession(FakeQuery(first=None))
 
     service = SubscriptionService(db)
     service.create_subscription = MagicMock(return_value=SimpleNamespace(plan=SimpleNamespace(feature_flags={})))
@@ -48,16 +55,7 @@ def test_message_limit_logs_event():
         is_active=lambda: True
     )
 
-    sub_query = MagicMock()
-    sub_query.filter.return_value = sub_query
-    sub_query.first.return_value = subscription
-
-    event_query = MagicMock()
-    event_query.filter.return_value = event_query
-    event_query.first.return_value = None
-
-    db = MagicMock()
-    db.query.side_effect = [sub_query, event_query]
+    db = FakeSession(FakeQuery(first=subscription), FakeQuery(first=None))
 
     service = SubscriptionService(db)
 
@@ -69,32 +67,25 @@ def test_message_limit_logs_event():
         assert kwargs["code"] == "MESSAGE_LIMIT_EXCEEDED"
 
 
-def test_verify_n8n_request_valid_signature():
-    payload = {"hello": "world"}
-    payload_str = json.dumps(payload, separators=(",", ":"), sort_keys=True)
-    signature, timestamp = n8n_security.generate_signature(payload_str, "secret")
-
-    with patch.object(n8n_security.settings, "N8N_TO_SVONTAI_SECRET", "secret"):
-        ok, error = n8n_security.verify_n8n_to_svontai_request(
-            payload_str.encode(),
-            signature,
-            str(timestamp),
-            "tenant-1"
-        )
-        assert ok is True
-        assert error == ""
-
-
-def test_verify_n8n_request_invalid_signature():
-    payload = {"hello": "world"}
-    payload_str = json.dumps(payload, separators=(",", ":"), sort_keys=True)
-
-    with patch.object(n8n_security.settings, "N8N_TO_SVONTAI_SECRET", "secret"):
-        ok, error = n8n_security.verify_n8n_to_svontai_request(
-            payload_str.encode(),
-            "invalid",
-            str(int(n8n_security.time.time())),
-            "tenant-1"
-        )
-        assert ok is False
-        assert "Invalid signature" in error
+def test_verify_n8n_request_valid_signature(n8n_secret, signed_payload):
+    signature, timestamp = signed_payload
+
+    ok, error = n8n_security.verify_n8n_to_svontai_request(
+        _PAYLOAD_BYTES,
+        signature,
+        str(timestamp),
+        "tenant-1"
+    )
+    assert ok is True
+    assert error == ""
+
+
+def test_verify_n8n_request_invalid_signature(n8n_secret):
+    ok, error = n8n_security.verify_n8n_to_svontai_request(
+        _PAYLOAD_BYTES,
+        "invalid",
+        str(int(n8n_security.time.time())),
+        "tenant-1"
+    )
+    assert ok is False
+    assert "Invalid signature" in error
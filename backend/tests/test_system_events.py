@@ -2,20 +2,11 @@ from unittest.mock import MagicMock
 
 from app.models.system_event import SystemEvent
 from app.services.system_event_service import SystemEventService
+from tests._fakes import FakeQuery, FakeSession
 
 
 def test_incident_created_on_spike():
-    db = MagicMock()
-
-    event_query = MagicMock()
-    event_query.filter.return_value = event_query
-    event_query.count.return_value = 5
-
-    incident_query = MagicMock()
-    incident_query.filter.return_value = incident_query
-    incident_query.first.return_value = None
-
-    db.query.side_effect = [event_query, incident_query]
+    db = FakeSession(FakeQuery(count=5), FakeQuery(first=None))
 
     service = SystemEventService(db)
     event = SystemEvent(
@@ -28,8 +19,8 @@ def test_incident_created_on_spike():
 
     service._maybe_create_incident(event)
 
-    db.add.assert_called_once()
-    db.commit.assert_called_once()
+    assert len(db.added) == 1
+    assert db.commits == 1
 
 
 def test_no_incident_for_non_error():
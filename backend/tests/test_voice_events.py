@@ -0,0 +1,107 @@
+import json
+import uuid
+
+import app.db.session as session_module
+from app.core.config import settings
+from app.core.n8n_security import generate_signature
+from app.api.routers.voice_events import VoiceEventBatch
+from app.core.voice_protocol import VOICE_EVENT_BATCH_MAX_EVENTS
+from app.models.call import Call
+from app.models.tenant import Tenant
+from app.models.user import User
+from app.services.usage_counter_service import UsageCounterService
+
+
+def _post_signed(client, path: str, payload: dict):
+    signature, ts = generate_signature(payload, settings.VOICE_GATEWAY_TO_SVONTAI_SECRET)
+    return client.post(
+        path,
+        content=json.dumps(payload),
+        headers={
+            "X-Voice-Signature": signature,
+            "X-Voice-Timestamp": str(ts),
+            "Content-Type": "application/json",
+        },
+    )
+
+
+def _create_tenant() -> uuid.UUID:
+    with session_module.SessionLocal() as db:
+        owner = User(
+            email=f"voice-{uuid.uuid4().hex[:10]}@example.com",
+            password_hash="hash",
+            full_name="Owner",
+        )
+        tenant = Tenant(name="Voice Tenant", owner=owner, settings={})
+        db.add_all([owner, tenant])
+        db.commit()
+        return tenant.id
+
+
+def _event(tenant_id, call_sid: str, event_type: str, **call) -> dict:
+    return {
+        "tenantId": str(tenant_id),
+        "eventType": event_type,
+        "eventId": f"twilio:{call_sid}:{event_type}",
+        "from": "tel:+905551112233",
+        "call": {"provider": "twilio", "provider_call_id": call_sid, **call},
+    }
+
+
+def test_batch_reports_each_event_and_keeps_earlier_ones(client, monkeypatch):
+    tenant_id = _create_tenant()
+
+    def _fail(*args, **kwargs):
+        raise RuntimeError("usage store unavailable")
+
+    monkeypatch.setattr(UsageCounterService, "increment_voice_seconds", _fail)
+
+    payload = {
+        "events": [
+            _event(tenant_id, "CA-ok", "voice_call_started", status="started"),
+            _event(uuid.uuid4(), "CA-missing", "voice_call_started", status="started"),
+            _event(tenant_id, "CA-broken", "voice_call_completed", status="completed", duration_seconds=7),
+        ]
+    }
+
+    response = _post_signed(client, "/api/v1/voice/events:batch", payload)
+
+    assert response.status_code == 200
+    results = response.json()
+    assert len(results) == 3
+    # Stored, but not forwarded: n8n is off in tests.
+    assert results[0]["message"] == "n8n is not enabled for this tenant"
+    assert results[0]["error"] is None
+    assert results[1] == {
+        "accepted": False,
+        "runId": "twilio:CA-missing:voice_call_started",
+        "message": None,
+        "error": "Tenant not found",
+    }
+    assert results[2]["accepted"] is False
+    assert results[2]["error"] == "Event processing failed"
+
+    with session_module.SessionLocal() as db:
+        call = db.query(Call).filter(Call.provider_call_id == "CA-ok").first()
+        assert call is not None
+        assert call.tenant_id == tenant_id
+
+
+def test_batch_rejects_more_events_than_the_protocol_limit(client):
+    events = [
+        _event(uuid.uuid4(), f"CA-{i}", "voice_call_started")
+        for i in range(VOICE_EVENT_BATCH_MAX_EVENTS + 1)
+    ]
+
+    response = _post_signed(client, "/api/v1/voice/events:batch", {"events": events})
+
+    assert response.status_code == 422
+
+
+def test_batch_events_keep_the_payload_they_were_parsed_from():
+    raw = _event(uuid.uuid4(), "CA-raw", "voice_call_started", status="started")
+    raw["extra"] = {"kept": True}
+
+    batch = VoiceEventBatch.model_validate({"events": [raw]})
+
+    assert batch.events[0]._raw_payload is raw
@@ -0,0 +1,275 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import voice_gateway.main as gateway
+
+
+@pytest.fixture()
+def event_queue(monkeypatch):
+    queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=2)
+    monkeypatch.setattr(gateway, "_event_queue", queue)
+    return queue
+
+
+def _drain(queue: asyncio.Queue[dict]) -> list[str]:
+    return [queue.get_nowait()["eventId"] for _ in range(queue.qsize())]
+
+
+async def test_enqueue_drops_oldest_event_when_queue_is_full(event_queue):
+    for event_id in ("a", "b", "c"):
+        await gateway._enqueue_voice_event({"eventId": event_id})
+
+    assert _drain(event_queue) == ["b", "c"]
+    # The dropped event was already marked done, so join() only waits on b and c.
+    event_queue.task_done()
+    event_queue.task_done()
+    await asyncio.wait_for(event_queue.join(), timeout=0.1)
+
+
+async def test_enqueue_without_running_worker_posts_inline(monkeypatch):
+    monkeypatch.setattr(gateway, "_event_queue", None)
+    posted: list[dict] = []
+
+    async def _post(event: dict) -> None:
+        posted.append(event)
+
+    monkeypatch.setattr(gateway, "_svontai_post_voice_event", _post)
+
+    await gateway._enqueue_voice_event({"eventId": "orphan"})
+
+    assert posted == [{"eventId": "orphan"}]
+
+
+def _status_error(status_code: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://backend.test")
+    return httpx.HTTPStatusError("error", request=request, response=httpx.Response(status_code, request=request))
+
+
+async def test_delivery_retries_transport_errors_and_5xx(monkeypatch):
+    monkeypatch.setattr(gateway, "_EVENT_RETRY_BASE_DELAY_SECONDS", 0)
+    failures = [httpx.ConnectError("refused"), _status_error(503)]
+    attempts: list[dict] = []
+
+    async def _post(event: dict) -> None:
+        attempts.append(event)
+        if failures:
+            raise failures.pop(0)
+
+    monkeypatch.setattr(gateway, "_svontai_post_voice_event", _post)
+
+    await gateway._deliver_voice_events([{"eventId": "a"}])
+
+    assert len(attempts) == gateway._EVENT_POST_ATTEMPTS
+
+
+async def test_delivery_does_not_retry_client_errors(monkeypatch, caplog):
+    monkeypatch.setattr(gateway, "_EVENT_RETRY_BASE_DELAY_SECONDS", 0)
+    attempts: list[dict] = []
+
+    async def _post(event: dict) -> None:
+        attempts.append(event)
+        raise _status_error(401)
+
+    monkeypatch.setattr(gateway, "_svontai_post_voice_event", _post)
+
+    with caplog.at_level(logging.WARNING, logger=gateway.__name__):
+        await gateway._deliver_voice_events([{"eventId": "a"}])
+
+    assert len(attempts) == 1
+    assert "Failed to post voice events ['a']" in caplog.text
+
+
+async def test_rejected_batch_falls_back_to_single_events(monkeypatch):
+    posted: list[str] = []
+
+    async def _post_batch(events: list[dict]) -> list[str]:
+        raise _status_error(422)
+
+    async def _post(event: dict) -> None:
+        posted.append(event["eventId"])
+
+    monkeypatch.setattr(gateway, "_svontai_post_voice_events", _post_batch)
+    monkeypatch.setattr(gateway, "_svontai_post_voice_event", _post)
+
+    await gateway._deliver_voice_events([{"eventId": "a"}, {"eventId": "b"}])
+
+    assert posted == ["a", "b"]
+
+
+async def test_next_event_batch_stops_at_batch_max(monkeypatch):
+    monkeypatch.setattr(gateway.settings, "VOICE_EVENT_BATCH_WINDOW_SECONDS", 0.05)
+    monkeypatch.setattr(gateway.settings, "VOICE_EVENT_BATCH_MAX", 2)
+    queue: asyncio.Queue[dict] = asyncio.Queue()
+    for event_id in ("a", "b", "c"):
+        queue.put_nowait({"eventId": event_id})
+
+    first = await gateway._next_event_batch(queue)
+    second = await gateway._next_event_batch(queue)
+
+    assert [e["eventId"] for e in first] == ["a", "b"]
+    assert [e["eventId"] for e in second] == ["c"]
+
+
+async def test_next_event_batch_closes_when_window_elapses(monkeypatch):
+    monkeypatch.setattr(gateway.settings, "VOICE_EVENT_BATCH_WINDOW_SECONDS", 0.05)
+    queue: asyncio.Queue[dict] = asyncio.Queue()
+    queue.put_nowait({"eventId": "a"})
+    loop = asyncio.get_running_loop()
+    loop.call_later(0.01, queue.put_nowait, {"eventId": "b"})
+    loop.call_later(0.2, queue.put_nowait, {"eventId": "late"})
+
+    batch = await gateway._next_event_batch(queue)
+
+    assert [e["eventId"] for e in batch] == ["a", "b"]
+
+
+async def test_lifespan_delivers_queued_events_before_shutdown(monkeypatch):
+    monkeypatch.setattr(gateway.settings, "VOICE_EVENT_BATCH_WINDOW_SECONDS", 0)
+    posted: list[dict] = []
+
+    async def _post(event: dict) -> None:
+        posted.append(event)
+
+    monkeypatch.setattr(gateway, "_svontai_post_voice_event", _post)
+
+    async with gateway.lifespan(gateway.app):
+        await gateway._enqueue_voice_event({"eventId": "started"})
+
+    assert posted == [{"eventId": "started"}]
+    assert gateway._event_queue is None
+
+
+async def test_lifespan_gives_up_on_stuck_delivery_after_timeout(monkeypatch, caplog):
+    monkeypatch.setattr(gateway.settings, "VOICE_EVENT_BATCH_WINDOW_SECONDS", 0)
+    monkeypatch.setattr(gateway, "_EVENT_DRAIN_TIMEOUT_SECONDS", 0.05)
+    cancelled = asyncio.Event()
+
+    async def _hang(event: dict) -> None:
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    monkeypatch.setattr(gateway, "_svontai_post_voice_event", _hang)
+
+    with caplog.at_level(logging.WARNING, logger=gateway.__name__):
+        async with gateway.lifespan(gateway.app):
+            await gateway._enqueue_voice_event({"eventId": "stuck"})
+
+    assert "undelivered voice events" in caplog.text
+    # Shutdown waited for the cancelled worker instead of leaving it pending.
+    assert cancelled.is_set()
+
+
+async def test_worker_logs_events_the_backend_rejected(monkeypatch, caplog):
+    monkeypatch.setattr(gateway.settings, "VOICE_EVENT_BATCH_WINDOW_SECONDS", 0.05)
+
+    async def _signed_post(url: str, payload: dict, **kwargs) -> httpx.Response:
+        results = [
+            {"accepted": False, "error": "Tenant not found" if event["eventId"] == "b" else None}
+            for event in payload["events"]
+        ]
+        return httpx.Response(200, json=results)
+
+    monkeypatch.setattr(gateway, "_signed_post", _signed_post)
+
+    with caplog.at_level(logging.WARNING, logger=gateway.__name__):
+        async with gateway.lifespan(gateway.app):
+            await gateway._enqueue_voice_event({"eventId": "a"})
+            await gateway._enqueue_voice_event({"eventId": "b"})
+
+    assert "Backend rejected voice events ['b']" in caplog.text
+
+
+@pytest.fixture()
+def tenant_lookups(monkeypatch):
+    """Empty tenant cache, a controllable clock, and a recording backend stub."""
+    clock = SimpleNamespace(now=1000.0)
+    lookups = SimpleNamespace(calls=[], clock=clock, error=None, release=None)
+
+    async def _resolve(to_number: str) -> dict:
+        lookups.calls.append(to_number)
+        if lookups.release is not None:
+            await lookups.release.wait()
+        if lookups.error is not None:
+            raise lookups.error
+        return {"tenantId": f"tenant-{to_number}"}
+
+    monkeypatch.setattr(gateway, "_tenant_cache", OrderedDict())
+    monkeypatch.setattr(gateway, "_tenant_inflight", {})
+    monkeypatch.setattr(gateway, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    monkeypatch.setattr(gateway, "_svontai_get_resolve_tenant", _resolve)
+    monkeypatch.setattr(gateway.settings, "TENANT_CACHE_TTL_SECONDS", 300)
+    return lookups
+
+
+async def test_tenant_cache_expires_after_ttl(tenant_lookups):
+    await gateway._resolve_tenant_cached("+1")
+    tenant_lookups.clock.now += 299
+    await gateway._resolve_tenant_cached("+1")
+    assert tenant_lookups.calls == ["+1"]
+
+    tenant_lookups.clock.now += 2
+    assert await gateway._resolve_tenant_cached("+1") == {"tenantId": "tenant-+1"}
+    assert tenant_lookups.calls == ["+1", "+1"]
+
+
+async def test_tenant_cache_evicts_least_recently_used(tenant_lookups, monkeypatch):
+    monkeypatch.setattr(gateway.settings, "TENANT_CACHE_MAXSIZE", 2)
+
+    for number in ("a", "b", "a", "c"):
+        await gateway._resolve_tenant_cached(number)
+
+    assert list(gateway._tenant_cache) == ["a", "c"]
+    await gateway._resolve_tenant_cached("b")
+    assert tenant_lookups.calls == ["a", "b", "c", "b"]
+
+
+async def test_concurrent_tenant_lookups_share_one_fetch(tenant_lookups):
+    tenant_lookups.release = asyncio.Event()
+
+    pending = asyncio.gather(*(gateway._resolve_tenant_cached("+1") for _ in range(3)))
+    await asyncio.sleep(0)
+    tenant_lookups.release.set()
+
+    assert await pending == [{"tenantId": "tenant-+1"}] * 3
+    assert tenant_lookups.calls == ["+1"]
+
+
+async def test_failed_tenant_lookup_is_not_cached(tenant_lookups):
+    tenant_lookups.error = RuntimeError("backend down")
+    tenant_lookups.release = asyncio.Event()
+
+    pending = asyncio.gather(
+        *(gateway._resolve_tenant_cached("+1") for _ in range(2)),
+        return_exceptions=True,
+    )
+    await asyncio.sleep(0)
+    tenant_lookups.release.set()
+
+    assert [type(r) for r in await pending] == [RuntimeError, RuntimeError]
+    assert tenant_lookups.calls == ["+1"]
+    assert gateway._tenant_inflight == {}
+    assert "+1" not in gateway._tenant_cache
+
+    tenant_lookups.error = None
+    assert await gateway._resolve_tenant_cached("+1") == {"tenantId": "tenant-+1"}
+    assert tenant_lookups.calls == ["+1", "+1"]
+
+
+def test_twilio_form_with_too_many_fields_is_rejected():
+    client = TestClient(gateway.app)
+    fields = {f"Field{i}": "x" for i in range(gateway._TWILIO_FORM_MAX_FIELDS)}
+
+    ok = client.post("/twilio/voice/status", data=fields)
+    too_many = client.post("/twilio/voice/status", data={**fields, "CallStatus": "completed"})
+
+    assert ok.status_code == 200
+    assert too_many.status_code == 400
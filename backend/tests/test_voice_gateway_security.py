@@ -0,0 +1,20 @@
+from app.core.n8n_security import verify_signature
+from voice_gateway.security import sign_payload
+
+
+def test_sign_payload_returns_signature_timestamp_and_body():
+    result = sign_payload({}, "x")
+
+    assert len(result) == 3
+    signature, ts, body = result
+    assert isinstance(signature, str) and isinstance(ts, int)
+    assert body == "{}"
+
+
+def test_sign_payload_verifies_on_backend_with_non_ascii_text():
+    payload = {"text": "Merhaba, nasılsınız?", "eventType": "voice_call_intent"}
+
+    signature, ts, _ = sign_payload(payload, "gateway-secret")
+    ok, error = verify_signature(payload, signature=signature, timestamp=ts, secret="gateway-secret")
+
+    assert ok, error
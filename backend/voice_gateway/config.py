@@ -1,5 +1,8 @@
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from app.core.voice_protocol import VOICE_EVENT_BATCH_MAX_EVENTS
+
 
 class VoiceGatewaySettings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", case_sensitive=True)
@@ -16,8 +19,19 @@ class VoiceGatewaySettings(BaseSettings):
     # Resolve endpoint + ingest endpoint paths (backend)
     SVONTAI_TELEPHONY_RESOLVE_PATH: str = "/api/v1/telephony/resolve"
     SVONTAI_VOICE_INGEST_PATH: str = "/api/v1/voice/events"
+    SVONTAI_VOICE_INGEST_BATCH_PATH: str = "/api/v1/voice/events:batch"
     SVONTAI_VOICE_INTENT_PATH: str = "/api/v1/voice/intent"
 
+    # Call events queued within this window are sent as one batch request.
+    # Set the window to 0 to post every event on its own. The batch size is
+    # capped by what the backend batch endpoint accepts.
+    VOICE_EVENT_BATCH_WINDOW_SECONDS: float = 0.5
+    VOICE_EVENT_BATCH_MAX: int = Field(default=VOICE_EVENT_BATCH_MAX_EVENTS, ge=1, le=VOICE_EVENT_BATCH_MAX_EVENTS)
+
+    # Resolved tenants are cached per dialled number for this long.
+    TENANT_CACHE_TTL_SECONDS: float = 300
+    TENANT_CACHE_MAXSIZE: int = 2048
+
     # Twilio voice mode:
     # - gather: IVR-style STT via Twilio <Gather input="speech"> (production friendly, low complexity)
     # - stream: Media Streams websocket (skeleton exists; realtime STT/TTS will be added later)
@@ -1,74 +1,323 @@
-import base64
+import asyncio
+import contextlib
 import logging
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 from typing import Any
+from urllib.parse import parse_qsl, urlencode
+from xml.sax.saxutils import escape as xml_escape
 
 import httpx
-from fastapi import FastAPI, Request, Response, WebSocket, WebSocketDisconnect, status
+import orjson
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect, status
 from fastapi.responses import PlainTextResponse
 
 from voice_gateway.config import settings
-from voice_gateway.security import sign_payload
+from voice_gateway.security import dump_canonical_json, keyed_hmac, sign_payload_bytes
 from voice_gateway.providers.base import InboundCallRequest
 from voice_gateway.providers.twilio import TwilioAdapter
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="SvontAI Voice Gateway", version="0.1.0")
+# Backend calls serialize the canonical JSON once and send the exact bytes
+# that were signed. The stdlib dump is kept (not orjson) because the backend
+# re-canonicalizes with ensure_ascii JSON before verifying.
+_SIGNING_MAC = keyed_hmac(settings.VOICE_GATEWAY_TO_SVONTAI_SECRET.encode("utf-8"))
+
+
+def _signed_headers(body: bytes) -> dict[str, str]:
+    signature, ts = sign_payload_bytes(body, _SIGNING_MAC)
+    return {
+        "X-Voice-Signature": signature,
+        "X-Voice-Timestamp": f"{ts}",
+        "Content-Type": "application/json",
+    }
+
+# One pooled client for all backend calls so consecutive Twilio webhooks reuse
+# keep-alive connections instead of paying a new TCP/TLS handshake each time.
+_http_client: httpx.AsyncClient | None = None
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(connect=2.0, read=15.0, write=5.0, pool=1.0),
+            # Retries only cover failed connection attempts, never a sent request.
+            transport=httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(max_keepalive_connections=64, max_connections=256, keepalive_expiry=60.0),
+                retries=1,
+            ),
+        )
+    return _http_client
+
+
+# Call lifecycle events are delivered by a background worker so Twilio
+# webhooks answer without waiting on the backend round-trip. Events that
+# arrive within the batch window (e.g. started + completed of a short call)
+# go out together in one request. The queue belongs to the running app and is
+# created by lifespan(); outside of it there is no worker to deliver events.
+_EVENT_QUEUE_MAXSIZE = 1000
+_EVENT_DRAIN_TIMEOUT_SECONDS = 5.0
+_EVENT_POST_ATTEMPTS = 3
+_EVENT_RETRY_BASE_DELAY_SECONDS = 0.25
+_event_queue: asyncio.Queue[dict] | None = None
+
+
+async def _enqueue_voice_event(event: dict) -> None:
+    queue = _event_queue
+    if queue is None:
+        # No worker outside the lifespan (e.g. a bare test client): deliver
+        # in the request instead of losing the event.
+        await _deliver_voice_events([event])
+        return
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        dropped = queue.get_nowait()
+        queue.task_done()
+        logger.warning("Voice event queue full, dropping %s", dropped.get("eventId"))
+        queue.put_nowait(event)
+
+
+async def _next_event_batch(queue: asyncio.Queue[dict]) -> list[dict]:
+    batch = [await queue.get()]
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.VOICE_EVENT_BATCH_WINDOW_SECONDS
+    while len(batch) < settings.VOICE_EVENT_BATCH_MAX:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(queue.get(), remaining))
+        except asyncio.TimeoutError:
+            break
+    return batch
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+async def _post_with_retry(post: Callable[[Any], Awaitable[Any]], payload: Any) -> Any:
+    """Call ``post`` with exponential backoff on transport errors and 5xx."""
+    for attempt in range(_EVENT_POST_ATTEMPTS):
+        try:
+            return await post(payload)
+        except Exception as exc:
+            if attempt == _EVENT_POST_ATTEMPTS - 1 or not _is_retryable(exc):
+                raise
+            await asyncio.sleep(_EVENT_RETRY_BASE_DELAY_SECONDS * 2**attempt)
+
+
+async def _deliver_voice_events(batch: list[dict]) -> None:
+    try:
+        if len(batch) == 1:
+            await _post_with_retry(_svontai_post_voice_event, batch[0])
+            return
+        try:
+            rejected = await _post_with_retry(_svontai_post_voice_events, batch)
+        except httpx.HTTPStatusError as exc:
+            if exc.response.status_code != 422:
+                raise
+            # One malformed event fails validation for the whole batch; send
+            # them one at a time so the valid ones still land.
+            for event in batch:
+                await _deliver_voice_events([event])
+            return
+        if rejected:
+            logger.warning("Backend rejected voice events %s", rejected)
+    except Exception as exc:
+        logger.warning(
+            "Failed to post voice events %s: %s",
+            [event.get("eventId") for event in batch],
+            exc,
+            exc_info=True,
+        )
+
+
+async def _voice_event_worker(queue: asyncio.Queue[dict]) -> None:
+    while True:
+        batch = await _next_event_batch(queue)
+        try:
+            await _deliver_voice_events(batch)
+        finally:
+            for _ in batch:
+                queue.task_done()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the shared backend client and event worker; drain both on shutdown."""
+    global _http_client, _event_queue
+    _get_http_client()
+    queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=_EVENT_QUEUE_MAXSIZE)
+    _event_queue = queue
+    worker = asyncio.create_task(_voice_event_worker(queue))
+    yield
+    try:
+        await asyncio.wait_for(queue.join(), timeout=_EVENT_DRAIN_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning("Shutting down with %d undelivered voice events", queue.qsize())
+    worker.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await worker
+    _event_queue = None
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+app = FastAPI(title="SvontAI Voice Gateway", version="0.1.0", lifespan=lifespan)
 
 
 def _normalize_base_url(value: str) -> str:
     return value.rstrip("/")
 
 
+_SVONTAI_BASE_URL = _normalize_base_url(settings.SVONTAI_BACKEND_URL)
+_RESOLVE_TENANT_URL = f"{_SVONTAI_BASE_URL}{settings.SVONTAI_TELEPHONY_RESOLVE_PATH}"
+_VOICE_EVENT_URL = f"{_SVONTAI_BASE_URL}{settings.SVONTAI_VOICE_INGEST_PATH}"
+_VOICE_EVENT_BATCH_URL = f"{_SVONTAI_BASE_URL}{settings.SVONTAI_VOICE_INGEST_BATCH_PATH}"
+_VOICE_INTENT_URL = f"{_SVONTAI_BASE_URL}{settings.SVONTAI_VOICE_INTENT_PATH}"
+
+
+# TwiML skeletons, encoded once. Substituted values are XML-escaped before
+# they are spliced in, so caller speech and query strings cannot break the
+# document.
+_TWIML_INBOUND_GATHER = """<?xml version="1.0" encoding="UTF-8"?>
+<Response>
+  <Say voice="Polly.Filiz">Merhaba. Size nasıl yardımcı olabilirim?</Say>
+  <Gather input="speech" language="tr-TR" speechTimeout="auto" action="%b" method="POST" />
+  <Say voice="Polly.Filiz">Yanıt alamadım. Tekrar dener misiniz?</Say>
+  <Gather input="speech" language="tr-TR" speechTimeout="auto" action="%b" method="POST" />
+  <Hangup />
+</Response>""".encode("utf-8")
+
+_TWIML_REPROMPT = """<?xml version="1.0" encoding="UTF-8"?>
+<Response>
+  <Say voice="Polly.Filiz">Sizi duyamadım. Tekrar eder misiniz?</Say>
+  <Gather input="speech" language="tr-TR" speechTimeout="auto" action="%b" method="POST" />
+  <Hangup />
+</Response>""".encode("utf-8")
+
+_TWIML_SAY_HANGUP = b"""<?xml version="1.0" encoding="UTF-8"?>
+<Response>
+  <Say voice="Polly.Filiz">%b</Say>
+  <Hangup />
+</Response>"""
+
+_TWIML_SAY_GATHER = b"""<?xml version="1.0" encoding="UTF-8"?>
+<Response>
+  <Say voice="Polly.Filiz">%b</Say>
+  <Gather input="speech" language="tr-TR" speechTimeout="auto" action="%b" method="POST" />
+  <Hangup />
+</Response>"""
+
+_XML_ATTR_ENTITIES = {'"': "&quot;"}
+
+
+def _intent_action_url(tenant_id: str, call_sid: str, from_number: str, to_number: str, turn: int) -> str:
+    # Percent-encode so E.164 numbers keep their "+" instead of decoding to a space.
+    query = urlencode({"tenantId": tenant_id, "callSid": call_sid, "from": from_number, "to": to_number, "turn": turn})
+    return f"/twilio/voice/intent?{query}"
+
+
+def _twiml_response(template: bytes, *values: str) -> Response:
+    content = template % tuple(xml_escape(value, _XML_ATTR_ENTITIES).encode("utf-8") for value in values)
+    return Response(content=content, media_type="application/xml")
+
+
+# Twilio voice callbacks carry roughly 30 fields; the cap only bounds hostile bodies.
+_TWILIO_FORM_MAX_FIELDS = 128
+
+
+async def _read_twilio_form(request: Request) -> dict[str, str]:
+    """
+    Read a Twilio webhook form as a plain dict (last value wins per key).
+
+    Twilio posts application/x-www-form-urlencoded, which parse_qsl handles
+    directly from the body without Starlette's FormData wrapper; any other
+    content type still goes through request.form(). A body with more than
+    _TWILIO_FORM_MAX_FIELDS fields is rejected with 400.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("application/x-www-form-urlencoded"):
+        body = await request.body()
+        try:
+            pairs = parse_qsl(
+                body.decode("utf-8", errors="replace"),
+                keep_blank_values=True,
+                max_num_fields=_TWILIO_FORM_MAX_FIELDS,
+            )
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Too many form fields")
+        return dict(pairs)
+    form = await request.form()
+    return {k: str(v) for k, v in form.multi_items()}
+
+
+async def _signed_post(url: str, payload: dict, *, timeout: float = 10.0) -> httpx.Response:
+    body = dump_canonical_json(payload).encode("utf-8")
+    resp = await _get_http_client().post(url, content=body, headers=_signed_headers(body), timeout=timeout)
+    resp.raise_for_status()
+    return resp
+
+
 async def _svontai_get_resolve_tenant(to_number: str) -> dict:
-    url = f"{_normalize_base_url(settings.SVONTAI_BACKEND_URL)}{settings.SVONTAI_TELEPHONY_RESOLVE_PATH}"
-    payload = {"to": to_number}
-    signature, ts, body_str = sign_payload(payload, settings.VOICE_GATEWAY_TO_SVONTAI_SECRET)
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.post(
-            url,
-            content=body_str,
-            headers={
-                "X-Voice-Signature": signature,
-                "X-Voice-Timestamp": str(ts),
-                "Content-Type": "application/json",
-            },
-        )
-        resp.raise_for_status()
-        return resp.json()
+    return (await _signed_post(_RESOLVE_TENANT_URL, {"to": to_number})).json()
 
 
 async def _svontai_post_voice_event(event: dict) -> None:
-    url = f"{_normalize_base_url(settings.SVONTAI_BACKEND_URL)}{settings.SVONTAI_VOICE_INGEST_PATH}"
-    signature, ts, body_str = sign_payload(event, settings.VOICE_GATEWAY_TO_SVONTAI_SECRET)
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.post(
-            url,
-            content=body_str,
-            headers={
-                "X-Voice-Signature": signature,
-                "X-Voice-Timestamp": str(ts),
-                "Content-Type": "application/json",
-            },
-        )
-        resp.raise_for_status()
+    await _signed_post(_VOICE_EVENT_URL, event)
+
+
+async def _svontai_post_voice_events(events: list[dict]) -> list[str]:
+    """Post a batch and return the ids of the events the backend rejected."""
+    results = (await _signed_post(_VOICE_EVENT_BATCH_URL, {"events": events})).json()
+    return [event.get("eventId") for event, result in zip(events, results) if result.get("error")]
+
 
 async def _svontai_post_voice_intent(intent_payload: dict) -> dict:
-    url = f"{_normalize_base_url(settings.SVONTAI_BACKEND_URL)}{settings.SVONTAI_VOICE_INTENT_PATH}"
-    signature, ts, body_str = sign_payload(intent_payload, settings.VOICE_GATEWAY_TO_SVONTAI_SECRET)
-    async with httpx.AsyncClient(timeout=15) as client:
-        resp = await client.post(
-            url,
-            content=body_str,
-            headers={
-                "X-Voice-Signature": signature,
-                "X-Voice-Timestamp": str(ts),
-                "Content-Type": "application/json",
-            },
-        )
-        resp.raise_for_status()
-        return resp.json()
+    return (await _signed_post(_VOICE_INTENT_URL, intent_payload, timeout=15.0)).json()
+
+
+# Phone number -> tenant mappings rarely change, so resolved tenants are kept
+# for a few minutes (LRU-bounded). Concurrent misses for the same number share
+# one backend request.
+_tenant_cache: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+_tenant_inflight: dict[str, asyncio.Task[dict]] = {}
+
+
+async def _fetch_and_cache_tenant(to_number: str) -> dict:
+    resolved = await _svontai_get_resolve_tenant(to_number)
+    if resolved.get("tenantId"):
+        _tenant_cache[to_number] = (time.monotonic() + settings.TENANT_CACHE_TTL_SECONDS, resolved)
+        _tenant_cache.move_to_end(to_number)
+        while len(_tenant_cache) > settings.TENANT_CACHE_MAXSIZE:
+            _tenant_cache.popitem(last=False)
+    return resolved
+
+
+async def _resolve_tenant_cached(to_number: str) -> dict:
+    cached = _tenant_cache.get(to_number)
+    if cached is not None:
+        if cached[0] > time.monotonic():
+            _tenant_cache.move_to_end(to_number)
+            return cached[1]
+        del _tenant_cache[to_number]
+
+    task = _tenant_inflight.get(to_number)
+    if task is None:
+        task = asyncio.create_task(_fetch_and_cache_tenant(to_number))
+        _tenant_inflight[to_number] = task
+        task.add_done_callback(lambda _: _tenant_inflight.pop(to_number, None))
+    return await asyncio.shield(task)
 
 
 @app.get("/health")
@@ -84,22 +333,24 @@ async def twilio_inbound_voice(request: Request) -> Response:
     Configure in Twilio console:
       - A Voice webhook URL -> https://<VOICE_GATEWAY_PUBLIC_URL>/twilio/voice/inbound
     """
-    form = await request.form()
-    to_number = str(form.get("To") or "").strip()
-    from_number = str(form.get("From") or "").strip()
-    call_sid = str(form.get("CallSid") or "").strip()
+    # One pass over the form; the field lookups and the stream-mode raw
+    # capture both read from this dict.
+    raw = await _read_twilio_form(request)
+    to_number = raw.get("To", "").strip()
+    from_number = raw.get("From", "").strip()
+    call_sid = raw.get("CallSid", "").strip()
 
     if not to_number or not call_sid:
         return Response("Bad Request", status_code=status.HTTP_400_BAD_REQUEST)
 
-    resolved = await _svontai_get_resolve_tenant(to_number)
+    resolved = await _resolve_tenant_cached(to_number)
     tenant_id = resolved.get("tenantId")
     if not tenant_id:
         return Response("Tenant not resolved", status_code=status.HTTP_404_NOT_FOUND)
 
     # Emit call started event to SvontAI (async best-effort)
     now = datetime.now(timezone.utc).isoformat()
-    await _svontai_post_voice_event(
+    await _enqueue_voice_event(
         {
             "tenantId": str(tenant_id),
             "eventType": "voice_call_started",
@@ -119,18 +370,9 @@ async def twilio_inbound_voice(request: Request) -> Response:
 
     # Default: gather loop mode (production-friendly)
     if (settings.TWILIO_VOICE_MODE or "gather").strip().lower() == "gather":
-        action_url = f"/twilio/voice/intent?tenantId={tenant_id}&callSid={call_sid}&from={from_number}&to={to_number}&turn=1"
-        status_cb = f"/twilio/voice/status?tenantId={tenant_id}&callSid={call_sid}&from={from_number}&to={to_number}"
-        twiml = f"""<?xml version="1.0" encoding="UTF-8"?>
-<Response>
-  <Say voice="Polly.Filiz">Merhaba. Size nasıl yardımcı olabilirim?</Say>
-  <Gather input="speech" language="tr-TR" speechTimeout="auto" action="{action_url}" method="POST" />
-  <Say voice="Polly.Filiz">Yanıt alamadım. Tekrar dener misiniz?</Say>
-  <Gather input="speech" language="tr-TR" speechTimeout="auto" action="{action_url}" method="POST" />
-  <Hangup />
-</Response>"""
+        action_url = _intent_action_url(str(tenant_id), call_sid, from_number, to_number, 1)
         # Twilio status callback config is done in console; we keep endpoint for it.
-        return Response(content=twiml, media_type="application/xml")
+        return _twiml_response(_TWIML_INBOUND_GATHER, action_url, action_url)
 
     # Fallback: stream mode (kept for later realtime pipeline)
     public_url = _normalize_base_url(settings.VOICE_GATEWAY_PUBLIC_URL)
@@ -144,7 +386,7 @@ async def twilio_inbound_voice(request: Request) -> Response:
             to_number=to_number,
             from_number=from_number,
             provider_call_id=call_sid,
-            raw={k: str(v) for k, v in form.items()},
+            raw=raw,
         ),
         ws_url=ws_url,
     )
@@ -163,8 +405,8 @@ async def twilio_voice_intent(request: Request) -> Response:
     from_number = params.get("from", "")
     to_number = params.get("to", "")
 
-    form = await request.form()
-    speech = str(form.get("SpeechResult") or "").strip()
+    form = await _read_twilio_form(request)
+    speech = (form.get("SpeechResult") or "").strip()
 
     if not tenant_id or not call_sid:
         return PlainTextResponse("Bad Request", status_code=status.HTTP_400_BAD_REQUEST)
@@ -172,14 +414,8 @@ async def twilio_voice_intent(request: Request) -> Response:
     if not speech:
         # reprompt
         next_turn = turn + 1
-        action_url = f"/twilio/voice/intent?tenantId={tenant_id}&callSid={call_sid}&from={from_number}&to={to_number}&turn={next_turn}"
-        twiml = f"""<?xml version="1.0" encoding="UTF-8"?>
-<Response>
-  <Say voice="Polly.Filiz">Sizi duyamadım. Tekrar eder misiniz?</Say>
-  <Gather input="speech" language="tr-TR" speechTimeout="auto" action="{action_url}" method="POST" />
-  <Hangup />
-</Response>"""
-        return Response(content=twiml, media_type="application/xml")
+        action_url = _intent_action_url(tenant_id, call_sid, from_number, to_number, next_turn)
+        return _twiml_response(_TWIML_REPROMPT, action_url)
 
     intent_payload = {
         "tenantId": str(tenant_id),
@@ -208,22 +444,14 @@ async def twilio_voice_intent(request: Request) -> Response:
     end_call = bool(result.get("endCall") or result.get("end_call") or False)
 
     if end_call:
-        twiml = f"""<?xml version="1.0" encoding="UTF-8"?>
-<Response>
-  <Say voice="Polly.Filiz">{response_text}</Say>
-  <Hangup />
-</Response>"""
-        return Response(content=twiml, media_type="application/xml")
+        return _twiml_response(_TWIML_SAY_HANGUP, response_text)
 
     next_turn = turn + 1
-    action_url = f"/twilio/voice/intent?tenantId={tenant_id}&callSid={call_sid}&from={from_number}&to={to_number}&turn={next_turn}"
-    twiml = f"""<?xml version="1.0" encoding="UTF-8"?>
-<Response>
-  <Say voice="Polly.Filiz">{response_text}</Say>
-  <Gather input="speech" language="tr-TR" speechTimeout="auto" action="{action_url}" method="POST" />
-  <Hangup />
-</Response>"""
-    return Response(content=twiml, media_type="application/xml")
+    action_url = _intent_action_url(tenant_id, call_sid, from_number, to_number, next_turn)
+    return _twiml_response(_TWIML_SAY_GATHER, response_text, action_url)
+
+
+_TERMINAL_CALL_STATUSES: frozenset[str] = frozenset({"completed", "busy", "no-answer", "failed", "canceled"})
 
 
 @app.post("/twilio/voice/status")
@@ -237,18 +465,18 @@ async def twilio_voice_status(request: Request) -> Response:
     from_number = params.get("from", "")
     to_number = params.get("to", "")
 
-    form = await request.form()
-    call_status = str(form.get("CallStatus") or "").strip()
-    call_duration = str(form.get("CallDuration") or "").strip()
+    form = await _read_twilio_form(request)
+    call_status = (form.get("CallStatus") or "").strip()
+    call_duration = (form.get("CallDuration") or "").strip()
 
     try:
-        duration_seconds = int(call_duration) if call_duration else 0
-    except Exception:
+        duration_seconds = int(call_duration or 0)
+    except ValueError:
         duration_seconds = 0
 
-    if tenant_id and call_sid and call_status in {"completed", "busy", "no-answer", "failed", "canceled"}:
+    if tenant_id and call_sid and call_status in _TERMINAL_CALL_STATUSES:
         now = datetime.now(timezone.utc).isoformat()
-        await _svontai_post_voice_event(
+        await _enqueue_voice_event(
             {
                 "tenantId": str(tenant_id),
                 "eventType": "voice_call_completed",
@@ -270,6 +498,69 @@ async def twilio_voice_status(request: Request) -> Response:
     return PlainTextResponse("OK")
 
 
+def _b64_decoded_len(payload: str) -> int:
+    """Size of the bytes a padded base64 string decodes to, without decoding it."""
+    return (len(payload) // 4) * 3 - payload.count("=", -2)
+
+
+_MEDIA_EVENT_MARKER = '"event":"media"'
+_PAYLOAD_KEY = '"payload":"'
+
+
+def _scan_media_payload(raw: str) -> str | None:
+    """
+    Pull the base64 payload straight out of a compact Twilio media frame.
+
+    Returns None when the frame is not a recognisable media frame, in which
+    case the caller falls back to a full JSON parse.
+    """
+    if _MEDIA_EVENT_MARKER not in raw:
+        return None
+    start = raw.find(_PAYLOAD_KEY)
+    if start == -1:
+        return None
+    start += len(_PAYLOAD_KEY)
+    end = raw.find('"', start)
+    if end == -1:
+        return None
+    payload = raw[start:end]
+    # Escaped characters would make the slice differ from the decoded value.
+    if "\\" in payload:
+        return None
+    return payload
+
+
+class _MediaStreamState:
+    """Per-connection counters for a Twilio media stream."""
+
+    __slots__ = ("audio_bytes",)
+
+    def __init__(self) -> None:
+        self.audio_bytes = 0
+
+
+def _process_media_frame(raw: str, state: _MediaStreamState) -> bool:
+    """
+    Account for one Twilio media-stream frame. Returns True on "stop".
+
+    Kept free of I/O and await points so the per-frame work stays a plain,
+    typed function.
+    """
+    payload = _scan_media_payload(raw)
+    if payload is None:
+        msg = orjson.loads(raw)
+        event = msg.get("event")
+        if event == "stop":
+            return True
+        if event != "media":
+            return False
+        payload = ((msg.get("media") or {}).get("payload")) or ""
+    payload = payload.strip()
+    if payload:
+        state.audio_bytes += _b64_decoded_len(payload)
+    return False
+
+
 @app.websocket("/ws/twilio/media")
 async def twilio_media_ws(ws: WebSocket) -> None:
     await ws.accept()
@@ -278,20 +569,10 @@ async def twilio_media_ws(ws: WebSocket) -> None:
     call_sid = ws.query_params.get("callSid", "")
     started_at = datetime.now(timezone.utc)
 
-    audio_bytes = 0
+    state = _MediaStreamState()
     try:
-        while True:
-            msg = await ws.receive_json()
-            event = msg.get("event")
-            if event == "media":
-                payload = (((msg.get("media") or {}).get("payload")) or "").strip()
-                if payload:
-                    try:
-                        audio_bytes += len(base64.b64decode(payload))
-                    except Exception:
-                        pass
-            elif event == "stop":
-                break
+        while not _process_media_frame(await ws.receive_text(), state):
+            pass
     except WebSocketDisconnect:
         pass
     except Exception as exc:
@@ -302,25 +583,22 @@ async def twilio_media_ws(ws: WebSocket) -> None:
 
         if tenant_id and call_sid:
             now = ended_at.isoformat()
-            try:
-                await _svontai_post_voice_event(
-                    {
-                        "tenantId": str(tenant_id),
-                        "eventType": "voice_call_completed",
-                        "eventId": f"twilio:{call_sid}:completed",
-                        "from": "tel:unknown",
-                        "to": "tel:unknown",
-                        "timestamp": now,
-                        "call": {
-                            "provider": "twilio",
-                            "provider_call_id": call_sid,
-                            "direction": "inbound",
-                            "status": "completed",
-                            "ended_at": now,
-                            "duration_seconds": duration_seconds,
-                            "meta": {"audio_bytes": audio_bytes},
-                        },
-                    }
-                )
-            except Exception as exc:
-                logger.warning("Failed to post call_completed: %s", exc, exc_info=True)
+            await _enqueue_voice_event(
+                {
+                    "tenantId": str(tenant_id),
+                    "eventType": "voice_call_completed",
+                    "eventId": f"twilio:{call_sid}:completed",
+                    "from": "tel:unknown",
+                    "to": "tel:unknown",
+                    "timestamp": now,
+                    "call": {
+                        "provider": "twilio",
+                        "provider_call_id": call_sid,
+                        "direction": "inbound",
+                        "status": "completed",
+                        "ended_at": now,
+                        "duration_seconds": duration_seconds,
+                        "meta": {"audio_bytes": state.audio_bytes},
+                    },
+                }
+            )
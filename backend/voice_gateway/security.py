@@ -1,7 +1,7 @@
 import json
 import time
 import hmac
-import hashlib
+from functools import lru_cache
 from typing import Tuple
 
 
@@ -9,9 +9,33 @@ def dump_canonical_json(payload: dict) -> str:
     return json.dumps(payload, separators=(",", ":"), sort_keys=True)
 
 
-def sign_payload(payload: dict, secret: str) -> Tuple[str, int, str]:
+def keyed_hmac(secret_bytes: bytes) -> hmac.HMAC:
+    """
+    Key an HMAC-SHA256 once; sign_payload_bytes() works on copies of it.
+    """
+    return hmac.new(secret_bytes, digestmod="sha256")
+
+
+def sign_payload_bytes(raw: bytes, keyed_mac: hmac.HMAC) -> Tuple[str, int]:
+    """
+    Sign an already-serialized canonical body with a pre-keyed HMAC.
+    """
     ts = int(time.time())
+    mac = keyed_mac.copy()
+    # Feed the pieces straight into the digest state instead of building a
+    # concatenated copy of the body first.
+    mac.update(str(ts).encode("ascii"))
+    mac.update(b".")
+    mac.update(raw)
+    return mac.hexdigest(), ts
+
+
+@lru_cache(maxsize=8)
+def _keyed_hmac_for_secret(secret: str) -> hmac.HMAC:
+    return keyed_hmac(secret.encode("utf-8"))
+
+
+def sign_payload(payload: dict, secret: str) -> Tuple[str, int, str]:
     payload_str = dump_canonical_json(payload)
-    message = f"{ts}.{payload_str}"
-    signature = hmac.new(secret.encode("utf-8"), message.encode("utf-8"), hashlib.sha256).hexdigest()
+    signature, ts = sign_payload_bytes(payload_str.encode("utf-8"), _keyed_hmac_for_secret(secret))
     return signature, ts, payload_str